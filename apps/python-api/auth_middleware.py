@@ -1,7 +1,15 @@
+import os
+import time
+import logging
+from datetime import datetime, timezone
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from typing import Optional
-from .supabase_client import supabase_client
+from cache import TTLCache
+from dataloader import DataLoader
+from supabase_client import supabase_client, Tables
+
+logger = logging.getLogger(__name__)
 
 # HTTP Bearer token scheme
 security = HTTPBearer()
@@ -72,18 +80,205 @@ class RequireRole:
 require_admin = RequireRole(['admin'])
 require_moderator = RequireRole(['admin', 'moderator'])
 
+class RequireEntitlement:
+    """
+    Dependency class to require an active subscription, optionally with
+    specific plan features. Entitlements come from a per-user cache.
+    Usage: Depends(RequireEntitlement(['custom_templates']))
+    """
+    def __init__(self, features: Optional[list] = None):
+        self.features = features or []
+    
+    async def __call__(self, current_user: dict = Depends(get_current_user)) -> dict:
+        entitlements = await get_user_entitlements(current_user["id"])
+        
+        if not entitlements["active"]:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Active subscription required"
+            )
+        
+        missing = [feature for feature in self.features if not entitlements["features"].get(feature)]
+        if missing:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail=f"Current plan does not include: {missing}"
+            )
+        
+        return {**current_user, "entitlements": entitlements}
+
+# Common entitlement dependencies
+require_premium = RequireEntitlement()
+
+# Read-through cache of profiles keyed by user id; None marks a missing user
+profile_cache = TTLCache(
+    max_size=int(os.getenv("PROFILE_CACHE_SIZE", "5000")),
+    ttl=float(os.getenv("PROFILE_CACHE_TTL", "60")),
+)
+PROFILE_NEGATIVE_CACHE_TTL = float(os.getenv("PROFILE_NEGATIVE_CACHE_TTL", "10"))
+PROFILE_BATCH_SIZE = int(os.getenv("PROFILE_BATCH_SIZE", "100"))
+_NOT_CACHED = object()
+
+def invalidate_profile(user_id: str) -> None:
+    """Drop cached profile data for a user. Call after creating or updating a profile."""
+    profile_cache.invalidate(user_id)
+    profile_cache.invalidate(("exists", user_id))
+
+def clear_profile_cache() -> None:
+    """Drop all cached profile data"""
+    profile_cache.clear()
+
+def _cache_missing_profile(user_id: str) -> None:
+    profile_cache.set(user_id, None, expires_at=time.time() + PROFILE_NEGATIVE_CACHE_TTL)
+
 # Helper function to get user from Supabase by ID
 async def get_user_profile(user_id: str) -> Optional[dict]:
     """Get user profile from Supabase profiles table"""
+    cached = profile_cache.get(user_id, _NOT_CACHED)
+    if cached is not _NOT_CACHED:
+        return dict(cached) if cached is not None else None
+    
     try:
-        result = supabase_client.admin_client.table('profiles').select('*').eq('id', user_id).execute()
-        return result.data[0] if result.data else None
+        result = await supabase_client.execute(
+            supabase_client.admin_client.table(Tables.PROFILES).select('*').eq('id', user_id)
+        )
     except Exception as e:
-        print(f"Error fetching user profile: {e}")
+        logger.warning(f"Error fetching user profile {user_id}: {e}")
+        return None
+    
+    if not result.data:
+        _cache_missing_profile(user_id)
         return None
+    
+    profile_cache.set(user_id, result.data[0])
+    return dict(result.data[0])
 
 # Helper function to check if user exists
 async def user_exists(user_id: str) -> bool:
     """Check if user exists in profiles table"""
-    profile = await get_user_profile(user_id)
-    return profile is not None
\ No newline at end of file
+    cached = profile_cache.get(user_id, _NOT_CACHED)
+    if cached is not _NOT_CACHED:
+        return cached is not None
+    if profile_cache.get(("exists", user_id)):
+        return True
+    
+    try:
+        result = await supabase_client.execute(
+            supabase_client.admin_client.table(Tables.PROFILES).select('id').eq('id', user_id).limit(1)
+        )
+    except Exception as e:
+        logger.warning(f"Error checking user existence {user_id}: {e}")
+        return False
+    
+    if not result.data:
+        _cache_missing_profile(user_id)
+        return False
+    
+    profile_cache.set(("exists", user_id), True)
+    return True
+
+# Helper function to get many profiles with a single query
+async def get_user_profiles(user_ids: list) -> dict:
+    """Get profiles for several users in one query, keyed by user id"""
+    profiles = {}
+    missing = []
+    for user_id in dict.fromkeys(user_ids):
+        cached = profile_cache.get(user_id, _NOT_CACHED)
+        if cached is _NOT_CACHED:
+            missing.append(user_id)
+        elif cached is not None:
+            profiles[user_id] = dict(cached)
+    
+    if not missing:
+        return profiles
+    
+    try:
+        result = await supabase_client.execute(
+            supabase_client.admin_client.table(Tables.PROFILES).select('*').in_('id', missing)
+        )
+    except Exception as e:
+        logger.warning(f"Error fetching {len(missing)} user profiles: {e}")
+        return profiles
+    
+    for profile in result.data:
+        profile_cache.set(profile['id'], profile)
+        profiles[profile['id']] = dict(profile)
+    for user_id in missing:
+        if user_id not in profiles:
+            _cache_missing_profile(user_id)
+    
+    return profiles
+
+def get_profile_loader() -> DataLoader:
+    """
+    Dependency providing a request-scoped profile loader.
+    Usage: profile = await loader.load(user_id)
+    """
+    return DataLoader(get_user_profiles, max_batch_size=PROFILE_BATCH_SIZE)
+
+# Resolved plan and features keyed by user id
+entitlement_cache = TTLCache(
+    max_size=int(os.getenv("ENTITLEMENT_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("ENTITLEMENT_CACHE_TTL", "300")),
+)
+ENTITLED_STATUSES = ('active',)
+
+def invalidate_entitlements(user_id: Optional[str] = None) -> None:
+    """
+    Drop cached entitlements for a user, or for everyone when user_id is None.
+    Call when a subscription, billing row or plan changes.
+    """
+    if user_id is None:
+        entitlement_cache.clear()
+    else:
+        entitlement_cache.invalidate(user_id)
+
+def _parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
+
+def _resolve_entitlements(subscription: Optional[dict]) -> tuple:
+    """Entitlements for a subscription row, and when they lapse (epoch seconds or None)"""
+    now = datetime.now(timezone.utc)
+    plan = (subscription or {}).get(Tables.SUBSCRIPTION_PLANS) or {}
+    trial_end = _parse_timestamp((subscription or {}).get("trial_end"))
+    period_end = _parse_timestamp((subscription or {}).get("current_period_end"))
+    
+    in_trial = trial_end is not None and trial_end > now
+    active = subscription is not None and (subscription["status"] in ENTITLED_STATUSES or in_trial)
+    lapses_at = trial_end if in_trial else period_end
+    
+    entitlements = {
+        "active": active,
+        "status": subscription["status"] if subscription else None,
+        "plan_id": subscription.get("plan_id") if subscription else None,
+        "plan": plan.get("name"),
+        "features": dict(plan.get("features") or {}) if active else {},
+        "credits_limit": plan.get("credits_limit", 0) if active else 0,
+        "expires_at": lapses_at.isoformat() if lapses_at else None,
+    }
+    expires_at = lapses_at.timestamp() if active and lapses_at and lapses_at > now else None
+    return entitlements, expires_at
+
+async def get_user_entitlements(user_id: str) -> dict:
+    """Get the user's active plan and features, resolved once per cache TTL"""
+    cached = entitlement_cache.get(user_id)
+    if cached is not None:
+        return dict(cached)
+    
+    try:
+        result = await supabase_client.execute(
+            supabase_client.admin_client.table(Tables.SUBSCRIPTIONS)
+            .select(f'status,plan_id,current_period_end,trial_end,{Tables.SUBSCRIPTION_PLANS}(name,features,credits_limit)')
+            .eq('user_id', user_id)
+            .limit(1)
+        )
+    except Exception:
+        logger.exception(f"Error fetching entitlements for user {user_id}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Could not resolve subscription"
+        )
+    
+    entitlements, expires_at = _resolve_entitlements(result.data[0] if result.data else None)
+    entitlement_cache.set(user_id, entitlements, expires_at=expires_at)
+    return dict(entitlements)
\ No newline at end of file
@@ -0,0 +1,114 @@
+import csv
+import io
+import os
+from datetime import date
+from typing import Literal, Optional, Tuple
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
+from auth_middleware import get_current_user, require_admin
+from json_response import json_list_response, ndjson_response
+from pagination import decode_keyset_cursor, keyset_cursor, keyset_page
+from supabase_client import supabase_client, Tables
+
+router = APIRouter(prefix="/billing", tags=["billing"])
+
+BILLING_PAGE_DEFAULT = 20
+BILLING_PAGE_MAX = 100
+BILLING_EXPORT_CHUNK = int(os.getenv("BILLING_EXPORT_CHUNK", "1000"))
+
+BILLING_HISTORY_COLUMNS = (
+    "id,subscription_id,amount_brl,amount_usd,tax_amount,status,billing_date,"
+    "due_date,paid_at,description,invoice_url,receipt_url"
+)
+BILLING_EXPORT_COLUMNS = [
+    "id", "user_id", "subscription_id", "stripe_invoice_id", "amount_brl", "amount_usd",
+    "tax_amount", "status", "billing_date", "due_date", "paid_at", "description",
+]
+
+
+@router.get("/history")
+async def get_billing_history(
+    limit: int = Query(BILLING_PAGE_DEFAULT, ge=1, le=BILLING_PAGE_MAX),
+    cursor: Optional[str] = None,
+    current_user: dict = Depends(get_current_user),
+):
+    """
+    The current user's invoices, newest first, with keyset pagination.
+    The cursor for the next page is returned in the X-Next-Cursor header.
+    """
+    position = decode_keyset_cursor(cursor, "billing_date", date.fromisoformat) if cursor else None
+    query = supabase_client.admin_client.table(Tables.BILLING_HISTORY).select(BILLING_HISTORY_COLUMNS).eq(
+        'user_id', current_user["id"]
+    )
+    result = await supabase_client.execute(keyset_page(query, 'billing_date', position, ascending=False).limit(limit + 1))
+
+    rows = result.data
+    headers = {}
+    if len(rows) > limit:
+        rows = rows[:limit]
+        headers["X-Next-Cursor"] = keyset_cursor(rows[-1], "billing_date")
+
+    return json_list_response(rows, headers=headers)
+
+
+@router.get("/export")
+async def export_billing_history(
+    format: Literal["csv", "ndjson"] = "ndjson",
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+    billing_status: Optional[Literal["pending", "paid", "failed", "refunded"]] = Query(None, alias="status"),
+    cursor: Optional[str] = None,
+    current_user: dict = Depends(require_admin),
+):
+    """
+    Stream billing_history in billing_date order for finance exports.
+    Rows are fetched BILLING_EXPORT_CHUNK at a time, so memory stays bounded
+    and no single query runs long. since is inclusive and until exclusive.
+    Every row carries a cursor; pass the last one received to resume an
+    interrupted export.
+    """
+    position = decode_keyset_cursor(cursor, "billing_date", date.fromisoformat) if cursor else None
+
+    def chunk_query(current: Optional[Tuple[str, str]]):
+        query = supabase_client.admin_client.table(Tables.BILLING_HISTORY).select(",".join(BILLING_EXPORT_COLUMNS))
+        if since:
+            query = query.gte('billing_date', since.isoformat())
+        if until:
+            query = query.lt('billing_date', until.isoformat())
+        if billing_status:
+            query = query.eq('status', billing_status)
+        return keyset_page(query, 'billing_date', current, ascending=True).limit(BILLING_EXPORT_CHUNK)
+
+    async def rows():
+        current = position
+        while True:
+            result = await supabase_client.execute(chunk_query(current))
+            for row in result.data:
+                yield row
+            if len(result.data) < BILLING_EXPORT_CHUNK:
+                break
+            current = (result.data[-1]["billing_date"], result.data[-1]["id"])
+
+    async def rows_with_cursor():
+        async for row in rows():
+            yield {**row, "cursor": keyset_cursor(row, "billing_date")}
+
+    async def generate_csv():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(BILLING_EXPORT_COLUMNS + ["cursor"])
+        async for row in rows():
+            writer.writerow([row.get(column) for column in BILLING_EXPORT_COLUMNS] + [keyset_cursor(row, "billing_date")])
+            if buffer.tell() >= 64 * 1024:
+                yield buffer.getvalue().encode()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue().encode()
+
+    if format == "csv":
+        return StreamingResponse(
+            generate_csv(),
+            media_type="text/csv",
+            headers={"Content-Disposition": 'attachment; filename="billing_history.csv"'},
+        )
+    return ndjson_response(rows_with_cursor())
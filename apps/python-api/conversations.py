@@ -0,0 +1,391 @@
+import os
+import uuid
+from datetime import datetime
+from typing import List, Optional, Tuple
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from auth_middleware import get_current_user, require_admin, get_profile_loader
+from cache import TTLCache
+from dataloader import DataLoader
+from json_response import json_list_response, ndjson_response
+from pagination import decode_keyset_cursor, keyset_cursor, keyset_page
+from presence import PresenceTracker
+from supabase_client import supabase_client, Tables
+
+router = APIRouter(prefix="/conversations", tags=["conversations"])
+
+CONVERSATION_BATCH_MAX = int(os.getenv("CONVERSATION_BATCH_MAX", "100"))
+RECONCILE_BATCH_SIZE = int(os.getenv("CONVERSATION_RECONCILE_BATCH_SIZE", "500"))
+# Unread counts stop at this value; clients show it as "99+"
+UNREAD_COUNT_MAX = int(os.getenv("UNREAD_COUNT_MAX", "100"))
+
+# Message history page sizes
+MESSAGE_PAGE_DEFAULT = 50
+MESSAGE_PAGE_MAX = 200
+MESSAGE_STREAM_CHUNK = 500
+# Profile fields attached to each message as its sender
+SENDER_FIELDS = ("id", "display_name", "avatar_url")
+
+# get_conversation_details rows keyed by conversation id
+conversation_details_cache = TTLCache(
+    max_size=int(os.getenv("CONVERSATION_CACHE_SIZE", "5000")),
+    ttl=float(os.getenv("CONVERSATION_CACHE_TTL", "30")),
+)
+
+# Direct conversation id keyed by the ordered user pair. Misses are not cached
+# so a conversation created after a lookup is found on the next one.
+direct_conversation_cache = TTLCache(
+    max_size=int(os.getenv("DIRECT_CONVERSATION_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("DIRECT_CONVERSATION_CACHE_TTL", "300")),
+)
+
+# Unread counts and has-unread flags keyed by (kind, user id)
+unread_cache = TTLCache(
+    max_size=int(os.getenv("UNREAD_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("UNREAD_CACHE_TTL", "5")),
+)
+
+async def _last_seen_flushed(keys: list) -> None:
+    for user_id in {user_id for _, user_id in keys}:
+        invalidate_unread(user_id)
+
+# Coalesced conversation_participants.last_seen writes; started in the app lifespan
+presence_tracker = PresenceTracker(
+    flush_interval=float(os.getenv("PRESENCE_FLUSH_MS", "2000")) / 1000,
+    max_pending=int(os.getenv("PRESENCE_MAX_PENDING", "50000")),
+    on_flush=_last_seen_flushed,
+)
+
+def invalidate_conversation_details(conversation_id: str) -> None:
+    """Drop cached details. Call when a message or participant is added to the conversation."""
+    conversation_details_cache.invalidate(conversation_id)
+
+def invalidate_unread(user_id: str) -> None:
+    """Drop cached unread state. Call when the user's last_seen changes."""
+    unread_cache.invalidate(("counts", user_id))
+    unread_cache.invalidate(("any", user_id))
+
+def _parse_uuid(value: str) -> Optional[str]:
+    """Canonical form of a UUID string, or None if it is not one"""
+    try:
+        return str(uuid.UUID(value))
+    except ValueError:
+        return None
+
+def _is_participant(details: dict, user_id: str) -> bool:
+    return any(participant.get("user_id") == user_id for participant in details.get("participants") or [])
+
+async def get_conversations_details(conversation_ids: List[str]) -> dict:
+    """
+    Get get_conversation_details rows for many conversations, keyed by id.
+    Cache misses are resolved with a single get_conversation_details_batch RPC.
+    """
+    details = {}
+    missing = []
+    for conversation_id in dict.fromkeys(conversation_ids):
+        cached = conversation_details_cache.get(conversation_id)
+        if cached is None:
+            missing.append(conversation_id)
+        else:
+            details[conversation_id] = cached
+
+    if missing:
+        result = await supabase_client.execute(
+            supabase_client.admin_client.rpc('get_conversation_details_batch', {'conv_ids': missing})
+        )
+        for row in result.data or []:
+            conversation_details_cache.set(row["id"], row)
+            details[row["id"]] = row
+
+    return details
+
+def _direct_pair(user1_id: str, user2_id: str) -> Tuple[str, str]:
+    return tuple(sorted((user1_id, user2_id)))
+
+async def find_direct_conversation(user1_id: str, user2_id: str) -> Optional[str]:
+    """
+    Get the direct conversation between two users, if any.
+    find_direct_conversation probes the unique direct_key index.
+    """
+    pair = _direct_pair(user1_id, user2_id)
+    conversation_id = direct_conversation_cache.get(pair)
+    if conversation_id is None:
+        result = await supabase_client.execute(
+            supabase_client.admin_client.rpc('find_direct_conversation', {'user1_id': pair[0], 'user2_id': pair[1]})
+        )
+        conversation_id = result.data
+        if conversation_id:
+            direct_conversation_cache.set(pair, conversation_id)
+    return conversation_id or None
+
+def invalidate_direct_conversation(user1_id: str, user2_id: str) -> None:
+    """Drop the cached direct conversation for a pair. Call when it is deleted."""
+    direct_conversation_cache.invalidate(_direct_pair(user1_id, user2_id))
+
+async def backfill_direct_conversation_keys(batch_size: int = RECONCILE_BATCH_SIZE) -> int:
+    """
+    Set direct_key on direct conversations created before the column existed.
+    Returns the number of conversations updated.
+    """
+    updated = 0
+    while True:
+        result = await supabase_client.execute(
+            supabase_client.admin_client.rpc('backfill_direct_conversation_keys', {'batch_size': batch_size})
+        )
+        if not result.data:
+            break
+        updated += result.data
+    return updated
+
+async def get_unread_counts(user_id: str) -> dict:
+    """Unread message count per conversation of the user, capped at UNREAD_COUNT_MAX"""
+    counts = unread_cache.get(("counts", user_id))
+    if counts is None:
+        result = await supabase_client.execute(
+            supabase_client.admin_client.rpc('get_unread_counts', {'p_user_id': user_id, 'max_count': UNREAD_COUNT_MAX})
+        )
+        counts = {row["conversation_id"]: row["unread_count"] for row in result.data or []}
+        unread_cache.set(("counts", user_id), counts)
+    return counts
+
+async def has_unread(user_id: str) -> bool:
+    """Whether the user has any unread message, without counting them"""
+    counts = unread_cache.get(("counts", user_id))
+    if counts is not None:
+        return any(counts.values())
+
+    flag = unread_cache.get(("any", user_id))
+    if flag is None:
+        result = await supabase_client.execute(
+            supabase_client.admin_client.rpc('has_unread_messages', {'p_user_id': user_id})
+        )
+        flag = bool(result.data)
+        unread_cache.set(("any", user_id), flag)
+    return flag
+
+async def _participant_ids(conversation_id: str) -> List[str]:
+    """User ids of a conversation, from cached details or conversation_participants"""
+    details = conversation_details_cache.get(conversation_id)
+    if details is not None:
+        return [participant["user_id"] for participant in details.get("participants") or []]
+    result = await supabase_client.execute(
+        supabase_client.admin_client.table(Tables.CONVERSATION_PARTICIPANTS)
+        .select('user_id')
+        .eq('conversation_id', conversation_id)
+    )
+    return [row["user_id"] for row in result.data or []]
+
+async def message_inserted(conversation_id: str) -> None:
+    """Invalidate caches that depend on the messages of a conversation"""
+    user_ids = await _participant_ids(conversation_id)
+    invalidate_conversation_details(conversation_id)
+    for user_id in user_ids:
+        invalidate_unread(user_id)
+
+def participants_changed(conversation_id: str, user_id: str) -> None:
+    """Invalidate caches that depend on the members of a conversation. Call when user_id joins or leaves."""
+    invalidate_conversation_details(conversation_id)
+    invalidate_unread(user_id)
+
+async def reconcile_conversation_counters(batch_size: int = RECONCILE_BATCH_SIZE) -> int:
+    """
+    Fix drift in the trigger-maintained message_count/last_message columns.
+    Walks conversations in id order and reconciles each batch with one RPC.
+    Returns the number of conversations corrected.
+    """
+    fixed = 0
+    last_id = None
+    while True:
+        query = supabase_client.admin_client.table(Tables.CONVERSATIONS).select('id').order('id').limit(batch_size)
+        if last_id:
+            query = query.gt('id', last_id)
+        result = await supabase_client.execute(query)
+        conversation_ids = [row['id'] for row in result.data or []]
+        if not conversation_ids:
+            break
+
+        reconciled = await supabase_client.execute(
+            supabase_client.admin_client.rpc('reconcile_conversation_counters', {'conv_ids': conversation_ids})
+        )
+        if reconciled.data:
+            fixed += reconciled.data
+            for conversation_id in conversation_ids:
+                invalidate_conversation_details(conversation_id)
+
+        if len(conversation_ids) < batch_size:
+            break
+        last_id = conversation_ids[-1]
+
+    return fixed
+
+@router.post("/direct/backfill")
+async def backfill_direct_keys(current_user: dict = Depends(require_admin)):
+    """Backfill direct_key for existing direct conversations"""
+    return {"updated": await backfill_direct_conversation_keys()}
+
+@router.get("/direct/{user_id}")
+async def get_direct_conversation(
+    user_id: str,
+    current_user: dict = Depends(get_current_user),
+):
+    """Get the direct conversation between the current user and user_id"""
+    user_id = _parse_uuid(user_id)
+    conversation_id = await find_direct_conversation(current_user["id"], user_id) if user_id else None
+    if conversation_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Conversation not found"
+        )
+    return {"conversation_id": conversation_id}
+
+@router.post("/reconcile")
+async def reconcile_counters(current_user: dict = Depends(require_admin)):
+    """Run the message counter reconciliation job"""
+    return {"fixed": await reconcile_conversation_counters()}
+
+async def require_participant(conversation_id: str, user_id: str) -> dict:
+    """Return the conversation details, or raise 404 if the user is not a participant"""
+    conversation_id = _parse_uuid(conversation_id)
+    details = (await get_conversations_details([conversation_id])).get(conversation_id) if conversation_id else None
+    if details is None or not _is_participant(details, user_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Conversation not found"
+        )
+    return details
+
+def _messages_query(conversation_id: str, position: Optional[Tuple[str, str]], newer: bool, limit: int):
+    """
+    Keyset query over messages on (created_at, id), served by the
+    (conversation_id, created_at DESC, id DESC) index.
+    Older pages are returned newest first, newer pages oldest first.
+    """
+    query = supabase_client.admin_client.table(Tables.MESSAGES).select('*').eq('conversation_id', conversation_id)
+    return keyset_page(query, 'created_at', position, ascending=newer).limit(limit)
+
+async def _with_senders(messages: list, loader: DataLoader) -> list:
+    """Attach the sender's public profile fields to each message"""
+    sender_ids = list(dict.fromkeys(message["sender_id"] for message in messages if message.get("sender_id")))
+    profiles = dict(zip(sender_ids, await loader.load_many(sender_ids)))
+    senders = {
+        sender_id: {field: profile.get(field) for field in SENDER_FIELDS}
+        for sender_id, profile in profiles.items()
+        if profile is not None
+    }
+    return [{**message, "sender": senders.get(message.get("sender_id"))} for message in messages]
+
+@router.get("/details")
+async def get_conversation_details_batch(
+    ids: List[str] = Query(...),
+    current_user: dict = Depends(get_current_user),
+):
+    """
+    Get details for several conversations in one round trip.
+    Conversations the user does not participate in are omitted.
+    """
+    if len(ids) > CONVERSATION_BATCH_MAX:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {CONVERSATION_BATCH_MAX} conversation ids per request"
+        )
+    conversation_ids = [_parse_uuid(conversation_id) for conversation_id in ids]
+    if None in conversation_ids:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid conversation id"
+        )
+
+    details = await get_conversations_details(conversation_ids)
+    return [
+        details[conversation_id]
+        for conversation_id in dict.fromkeys(conversation_ids)
+        if conversation_id in details and _is_participant(details[conversation_id], current_user["id"])
+    ]
+
+@router.get("/unread")
+async def get_unread(
+    has_any: bool = Query(False, alias="any"),
+    current_user: dict = Depends(get_current_user),
+):
+    """
+    Unread message counts for all of the user's conversations.
+    With any=true, only reports whether there is at least one unread message.
+    """
+    if has_any:
+        return {"has_unread": await has_unread(current_user["id"])}
+
+    counts = await get_unread_counts(current_user["id"])
+    return {"conversations": counts, "total": sum(counts.values())}
+
+@router.get("/{conversation_id}")
+async def get_conversation(
+    conversation_id: str,
+    current_user: dict = Depends(get_current_user),
+):
+    """Get participants, message count and last message for a conversation"""
+    return await require_participant(conversation_id, current_user["id"])
+
+@router.post("/{conversation_id}/seen", status_code=status.HTTP_202_ACCEPTED)
+async def mark_conversation_seen(
+    conversation_id: str,
+    current_user: dict = Depends(get_current_user),
+):
+    """
+    Record that the user has read the conversation up to now.
+    last_seen is written by the presence tracker on its next flush.
+    """
+    details = await require_participant(conversation_id, current_user["id"])
+    return {"accepted": presence_tracker.touch(details["id"], current_user["id"])}
+
+@router.get("/{conversation_id}/messages")
+async def get_conversation_messages(
+    conversation_id: str,
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    limit: int = Query(MESSAGE_PAGE_DEFAULT, ge=1, le=MESSAGE_PAGE_MAX),
+    stream: bool = False,
+    current_user: dict = Depends(get_current_user),
+    profile_loader: DataLoader = Depends(get_profile_loader),
+):
+    """
+    Message history with keyset pagination.
+    Without a cursor, returns the newest messages first. before=<cursor> pages
+    back through older messages; after=<cursor> returns newer messages oldest
+    first. The cursor to continue in the same direction is returned in the
+    X-Next-Cursor header. With stream=true, every message in that direction
+    is streamed as NDJSON, fetched in bounded chunks. Each message carries
+    its sender's id, display_name and avatar_url.
+    """
+    if before and after:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Use either before or after, not both"
+        )
+
+    conversation_id = (await require_participant(conversation_id, current_user["id"]))["id"]
+    newer = after is not None
+    position = decode_keyset_cursor(after or before, "created_at", datetime.fromisoformat) if (after or before) else None
+
+    if stream:
+        async def generate():
+            current = position
+            while True:
+                result = await supabase_client.execute(
+                    _messages_query(conversation_id, current, newer, MESSAGE_STREAM_CHUNK)
+                )
+                for message in await _with_senders(result.data, profile_loader):
+                    yield message
+                if len(result.data) < MESSAGE_STREAM_CHUNK:
+                    break
+                current = (result.data[-1]["created_at"], result.data[-1]["id"])
+
+        return ndjson_response(generate())
+
+    result = await supabase_client.execute(_messages_query(conversation_id, position, newer, limit + 1))
+    messages = result.data
+    headers = {}
+    if len(messages) > limit:
+        messages = messages[:limit]
+        headers["X-Next-Cursor"] = keyset_cursor(messages[-1], "created_at")
+    messages = await _with_senders(messages, profile_loader)
+
+    return json_list_response(messages, headers=headers)
@@ -0,0 +1,47 @@
+from typing import Hashable
+from periodic_flusher import PeriodicFlusher
+from supabase_client import supabase_client
+
+
+class CounterBuffer(PeriodicFlusher):
+    """
+    Aggregates increments per key in process and writes them periodically.
+    Every flush_interval seconds the accumulated deltas are sent with
+    rpc(function, {"deltas": [{"id": key, "count": n}, ...]}) calls of up to
+    batch_size keys, so a hot key costs one write per interval instead of
+    one per event.
+    Increments for new keys are dropped while max_keys keys are pending.
+    Increments are not idempotent, so a batch whose write may have been
+    applied (a timeout) is discarded instead of retried.
+    """
+    def __init__(self, function: str, flush_interval: float = 5.0, max_keys: int = 10000, batch_size: int = 1000):
+        super().__init__(function, flush_interval, max_keys, batch_size)
+        self.function = function
+        self.recorded = 0
+        self.dropped = 0
+
+    def increment(self, key: Hashable, count: int = 1) -> bool:
+        """Add count to key. Returns False if the increment was dropped."""
+        if not self._merge(key, count):
+            self.dropped += count
+            return False
+        self.recorded += count
+        return True
+
+    def stats(self) -> dict:
+        return {
+            **super().stats(),
+            "pending_count": sum(self._pending.values()),
+            "recorded": self.recorded,
+            "dropped": self.dropped,
+        }
+
+    def _combine(self, current: int, count: int) -> int:
+        return current + count
+
+    async def _write(self, batch: list) -> None:
+        await supabase_client.execute(
+            supabase_client.admin_client.rpc(self.function, {
+                'deltas': [{"id": key, "count": count} for key, count in batch]
+            })
+        )
@@ -0,0 +1,65 @@
+import asyncio
+from typing import Awaitable, Callable, Hashable, Iterable, Optional
+
+
+class DataLoader:
+    """
+    Batches and dedupes loads issued in the same event-loop tick.
+    batch_load receives a list of unique keys and returns a dict of key -> value;
+    keys absent from the dict resolve to None. Create one loader per request.
+    """
+    def __init__(
+        self,
+        batch_load: Callable[[list], Awaitable[dict]],
+        max_batch_size: Optional[int] = None,
+    ):
+        self.batch_load = batch_load
+        self.max_batch_size = max_batch_size
+        self._futures: dict = {}
+        self._pending: list = []
+        self._scheduled = False
+        # Running batches; the loop only keeps weak references to tasks
+        self._tasks: set = set()
+
+    def load(self, key: Hashable) -> "asyncio.Future":
+        """Return a future for key, scheduling a batch at the end of the current tick"""
+        future = self._futures.get(key)
+        if future is not None:
+            return future
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._futures[key] = future
+        self._pending.append(key)
+        if not self._scheduled:
+            self._scheduled = True
+            loop.call_soon(self._dispatch)
+        return future
+
+    def load_many(self, keys: Iterable[Hashable]) -> "asyncio.Future":
+        """Return a future resolving to the values for keys, in order"""
+        return asyncio.gather(*(self.load(key) for key in keys))
+
+    def _dispatch(self) -> None:
+        keys, self._pending, self._scheduled = self._pending, [], False
+        size = self.max_batch_size or len(keys)
+        for start in range(0, len(keys), size):
+            task = asyncio.ensure_future(self._run(keys[start:start + size]))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, keys: list) -> None:
+        try:
+            results = await self.batch_load(keys)
+        except Exception as e:
+            for key in keys:
+                # Failed keys are retried on the next load
+                future = self._futures.pop(key)
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for key in keys:
+            future = self._futures[key]
+            if not future.done():
+                future.set_result(results.get(key))
@@ -0,0 +1,147 @@
+import os
+import gzip
+import uuid
+import asyncio
+import hashlib
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Response, status
+from auth_middleware import get_current_user, require_admin
+from counter_buffer import CounterBuffer
+from json_response import dumps, etag_matches
+from refresher import VersionedSnapshot
+from supabase_client import supabase_client, Tables
+
+router = APIRouter(prefix="/help", tags=["help"])
+
+HELP_CENTER_REFRESH = float(os.getenv("HELP_CENTER_REFRESH", "60"))
+HELP_CATEGORY_COLUMNS = "id,slug,name,description,icon,sort_order"
+# Counters are left out so view counting does not change the payload
+HELP_ITEM_COLUMNS = "id,category_id,question,answer,tags,sort_order,is_featured,created_at"
+
+# FAQ views are counted in memory and written with increment_faq_view_counts
+faq_view_counter = CounterBuffer(
+    'increment_faq_view_counts',
+    flush_interval=float(os.getenv("FAQ_VIEW_FLUSH_SECONDS", "10")),
+    max_keys=int(os.getenv("FAQ_VIEW_MAX_KEYS", "10000")),
+)
+
+
+def build_help_center(categories: list, items: list) -> dict:
+    """
+    Category tree with each category's active items in display order, plus
+    the featured items across all categories.
+    """
+    by_category = {category["id"]: [] for category in categories}
+    for item in sorted(items, key=lambda item: (item.get("sort_order") or 0, item.get("created_at") or "")):
+        if item.get("category_id") in by_category:
+            by_category[item["category_id"]].append(item)
+
+    tree = [
+        {**category, "items": by_category[category["id"]]}
+        for category in sorted(categories, key=lambda category: (category.get("sort_order") or 0, category["slug"]))
+    ]
+    featured = [
+        dict(item, category_slug=category["slug"])
+        for category in tree
+        for item in category["items"]
+        if item.get("is_featured")
+    ]
+    return {"categories": tree, "featured": featured}
+
+
+class HelpCenterSnapshot:
+    """
+    Pre-serialized help center payload, plain and gzip-compressed.
+    Each representation has its own strong ETag, since the bytes differ.
+    """
+    def __init__(self, model: dict, version: str):
+        self.version = version
+        digest = hashlib.sha1(version.encode()).hexdigest()
+        self.etag = f'"{digest}"'
+        self.gzip_etag = f'"{digest}-gz"'
+        self.payload = dumps(model)
+        self.compressed = gzip.compress(self.payload, compresslevel=6)
+        self.categories = len(model["categories"])
+
+
+class HelpCenter(VersionedSnapshot):
+    """
+    In-process help center read model.
+    A background task compares the version of faq_categories and faq_items
+    (row counts and latest updated_at) every refresh_interval seconds and
+    rebuilds the snapshot only when either changed.
+    """
+    def __init__(self, refresh_interval: float = HELP_CENTER_REFRESH):
+        super().__init__("Help center", (Tables.FAQ_CATEGORIES, Tables.FAQ_ITEMS), refresh_interval)
+
+    def stats(self) -> dict:
+        return {
+            "categories": self.snapshot.categories if self.snapshot else 0,
+            "size": len(self.snapshot.payload) if self.snapshot else 0,
+            "compressed_size": len(self.snapshot.compressed) if self.snapshot else 0,
+            "version": self.snapshot.version if self.snapshot else None,
+            "checks": self.checks,
+            "rebuilds": self.reloads,
+        }
+
+    async def _load(self, version: str) -> HelpCenterSnapshot:
+        categories, items = await asyncio.gather(
+            supabase_client.execute(
+                supabase_client.admin_client.table(Tables.FAQ_CATEGORIES)
+                .select(HELP_CATEGORY_COLUMNS)
+                .eq('is_active', True)
+            ),
+            supabase_client.execute(
+                supabase_client.admin_client.table(Tables.FAQ_ITEMS)
+                .select(HELP_ITEM_COLUMNS)
+                .eq('is_active', True)
+            ),
+        )
+        return HelpCenterSnapshot(build_help_center(categories.data or [], items.data or []), version)
+
+
+help_center = HelpCenter()
+
+@router.get("")
+async def get_help_center(
+    if_none_match: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None),
+    current_user: dict = Depends(get_current_user),
+):
+    """
+    Active FAQ categories with their items in display order and the featured
+    items, served from memory. Honours If-None-Match and sends the gzip
+    payload when the client accepts it.
+    """
+    snapshot = await help_center.get()
+    compress = "gzip" in (accept_encoding or "").lower()
+    etag = snapshot.gzip_etag if compress else snapshot.etag
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "Accept-Encoding"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    if compress:
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=snapshot.compressed, media_type="application/json", headers=headers)
+    return Response(content=snapshot.payload, media_type="application/json", headers=headers)
+
+@router.post("/refresh")
+async def refresh_help_center(current_user: dict = Depends(require_admin)):
+    """Rebuild the help center read model now"""
+    await help_center.refresh(force=True)
+    return help_center.stats()
+
+@router.post("/faq/{item_id}/view", status_code=status.HTTP_202_ACCEPTED)
+async def record_faq_view(
+    item_id: str,
+    current_user: dict = Depends(get_current_user),
+):
+    """Count a view of an FAQ item; view_count is updated on the next flush"""
+    try:
+        item_id = str(uuid.UUID(item_id))
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="FAQ item not found"
+        )
+    return {"accepted": faq_view_counter.increment(item_id)}
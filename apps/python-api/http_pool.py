@@ -0,0 +1,100 @@
+import os
+import threading
+import time
+import httpx
+
+
+class PoolConfig:
+    """Connection pool settings for the shared Supabase HTTP transport"""
+    def __init__(self):
+        self.max_connections = int(os.getenv("SUPABASE_HTTP_MAX_CONNECTIONS", "100"))
+        self.max_keepalive_connections = int(os.getenv("SUPABASE_HTTP_MAX_KEEPALIVE", "20"))
+        self.keepalive_expiry = float(os.getenv("SUPABASE_HTTP_KEEPALIVE_EXPIRY", "30"))
+        self.http2 = os.getenv("SUPABASE_HTTP2", "true").lower() in ("1", "true", "yes")
+        self.connect_timeout = float(os.getenv("SUPABASE_HTTP_CONNECT_TIMEOUT", "5"))
+        self.read_timeout = float(os.getenv("SUPABASE_HTTP_READ_TIMEOUT", "10"))
+
+
+class InstrumentedTransport(httpx.HTTPTransport):
+    """
+    HTTPTransport that records how long requests wait for a connection.
+    Wait time runs from the request start until the pool either opens a new
+    connection or starts sending on a reused one.
+    """
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.in_flight = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        start = time.perf_counter()
+        waited = []
+        parent_trace = request.extensions.get("trace")
+
+        def trace(event_name: str, info: dict):
+            if not waited and (
+                event_name == "connection.connect_tcp.started"
+                or event_name.endswith("send_request_headers.started")
+            ):
+                waited.append(time.perf_counter() - start)
+            if parent_trace is not None:
+                parent_trace(event_name, info)
+
+        request.extensions = {**request.extensions, "trace": trace}
+        with self._lock:
+            self.requests += 1
+            self.in_flight += 1
+        try:
+            return super().handle_request(request)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+                if waited:
+                    self.wait_time_total += waited[0]
+                    self.wait_time_max = max(self.wait_time_max, waited[0])
+
+    def stats(self) -> dict:
+        """Return connection usage and pool wait time counters"""
+        connections = self._pool.connections
+        idle = sum(1 for connection in connections if connection.is_idle())
+        with self._lock:
+            return {
+                "connections": len(connections),
+                "in_use": len(connections) - idle,
+                "idle": idle,
+                "in_flight": self.in_flight,
+                "requests": self.requests,
+                "wait_time_total": self.wait_time_total,
+                "wait_time_avg": self.wait_time_total / self.requests if self.requests else 0.0,
+                "wait_time_max": self.wait_time_max,
+            }
+
+
+def create_http_transport(config: PoolConfig = None) -> InstrumentedTransport:
+    """Create the instrumented connection pool shared by the Supabase clients"""
+    config = config or PoolConfig()
+    return InstrumentedTransport(
+        http2=config.http2,
+        limits=httpx.Limits(
+            max_connections=config.max_connections,
+            max_keepalive_connections=config.max_keepalive_connections,
+            keepalive_expiry=config.keepalive_expiry,
+        ),
+    )
+
+
+def create_http_client(transport: InstrumentedTransport, config: PoolConfig = None) -> httpx.Client:
+    """
+    Create a keep-alive httpx client on top of a shared transport.
+    Each Supabase client needs its own httpx.Client: postgrest stores its
+    base URL and apikey/Authorization headers on the client it is given.
+    """
+    config = config or PoolConfig()
+    return httpx.Client(
+        transport=transport,
+        timeout=httpx.Timeout(config.read_timeout, connect=config.connect_timeout),
+        follow_redirects=True,
+    )
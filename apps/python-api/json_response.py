@@ -0,0 +1,47 @@
+from decimal import Decimal
+from typing import AsyncIterable, Optional
+import orjson
+from fastapi.responses import ORJSONResponse, StreamingResponse
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def _default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(value) -> bytes:
+    """Serialize with orjson; datetime and UUID are handled natively"""
+    return orjson.dumps(value, default=_default)
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header matches etag (weak comparison)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(
+        candidate.strip().removeprefix("W/") == etag
+        for candidate in if_none_match.split(",")
+    )
+
+
+def json_list_response(rows: list, headers: Optional[dict] = None) -> ORJSONResponse:
+    """
+    Serialize database rows straight to response bytes.
+    Returning the response directly skips FastAPI's response_model validation,
+    so only use it for rows that already match the declared model.
+    """
+    return ORJSONResponse(rows, headers=headers)
+
+
+def ndjson_response(rows: AsyncIterable[dict], headers: Optional[dict] = None) -> StreamingResponse:
+    """Stream rows as newline-delimited JSON as they arrive"""
+    async def generate():
+        async for row in rows:
+            yield orjson.dumps(row, default=_default) + b"\n"
+
+    return StreamingResponse(generate(), media_type=NDJSON_MEDIA_TYPE, headers=headers)
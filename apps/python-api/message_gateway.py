@@ -0,0 +1,323 @@
+import os
+import time
+import asyncio
+import logging
+from collections import defaultdict
+from contextlib import suppress
+from typing import Iterable, Optional, Tuple
+from fastapi import APIRouter, HTTPException, Request, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import StreamingResponse
+from json_response import dumps
+from supabase_client import supabase_client, Tables
+from auth_middleware import invalidate_entitlements
+from conversations import message_inserted, participants_changed
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/realtime", tags=["realtime"])
+
+# Messages buffered per connection before it is marked as lagging
+SUBSCRIBER_QUEUE_SIZE = int(os.getenv("REALTIME_QUEUE_SIZE", "256"))
+# Seconds between SSE keep-alive comments
+SSE_KEEPALIVE = float(os.getenv("REALTIME_SSE_KEEPALIVE", "15"))
+
+
+class Subscription:
+    """A connection's view of the broker: a bounded queue of new messages"""
+    def __init__(self, user_id: str, conversation_ids: Iterable[str], queue_size: int):
+        self.user_id = user_id
+        self.conversation_ids = set(conversation_ids)
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.lagged = False
+
+    async def get(self) -> dict:
+        return await self.queue.get()
+
+
+class InMemoryBroker:
+    """
+    In-process fan-out of new messages to connected users.
+    Subscriptions are indexed by conversation id, so publishing costs one
+    queue put per connected participant. A subscriber whose queue is full
+    misses the message and is marked lagged so the gateway can tell the
+    client to resync from the message history endpoint.
+    """
+    def __init__(self, queue_size: int = SUBSCRIBER_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._by_conversation = defaultdict(set)
+        self._by_user = defaultdict(set)
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+
+    def subscribe(self, user_id: str, conversation_ids: Iterable[str]) -> Subscription:
+        subscription = Subscription(user_id, conversation_ids, self.queue_size)
+        self._by_user[user_id].add(subscription)
+        for conversation_id in subscription.conversation_ids:
+            self._by_conversation[conversation_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self._discard(self._by_user, subscription.user_id, subscription)
+        for conversation_id in subscription.conversation_ids:
+            self._discard(self._by_conversation, conversation_id, subscription)
+
+    def join(self, user_id: str, conversation_id: str) -> None:
+        """Add a conversation to every open subscription of a user"""
+        for subscription in self._by_user.get(user_id, ()):
+            subscription.conversation_ids.add(conversation_id)
+            self._by_conversation[conversation_id].add(subscription)
+
+    def leave(self, user_id: str, conversation_id: str) -> None:
+        """Remove a conversation from every open subscription of a user"""
+        for subscription in self._by_user.get(user_id, ()):
+            subscription.conversation_ids.discard(conversation_id)
+            self._discard(self._by_conversation, conversation_id, subscription)
+
+    def publish(self, message: dict) -> int:
+        """Deliver a message to subscribers of its conversation; returns the number reached"""
+        self.published += 1
+        reached = 0
+        for subscription in self._by_conversation.get(message.get("conversation_id"), ()):
+            try:
+                subscription.queue.put_nowait(message)
+                reached += 1
+            except asyncio.QueueFull:
+                subscription.lagged = True
+                self.dropped += 1
+        self.delivered += reached
+        return reached
+
+    def stats(self) -> dict:
+        return {
+            "connections": sum(len(subscriptions) for subscriptions in self._by_user.values()),
+            "users": len(self._by_user),
+            "conversations": len(self._by_conversation),
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+        }
+
+    @staticmethod
+    def _discard(index: dict, key: str, subscription: Subscription) -> None:
+        subscriptions = index.get(key)
+        if subscriptions is not None:
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del index[key]
+
+
+class SupabaseChangeFeed:
+    """
+    Single Supabase Realtime subscription per process feeding the broker.
+    New messages are published to their conversation; participant rows that
+    are inserted or deleted add or remove the conversation in that user's
+    open subscriptions and drop the cached conversation details. Deletes
+    need REPLICA IDENTITY FULL on conversation_participants. Changes to
+    subscriptions, billing history and plans invalidate cached entitlements.
+    """
+    def __init__(self, broker: InMemoryBroker):
+        self.broker = broker
+        self._client = None
+        self._tasks = set()
+
+    async def start(self) -> None:
+        from realtime import AsyncRealtimeClient
+
+        url = os.getenv("SUPABASE_URL", "").rstrip("/")
+        realtime_url = "ws" + url[len("http"):] + "/realtime/v1" if url.startswith("http") else url
+        self._client = AsyncRealtimeClient(realtime_url, os.getenv("SUPABASE_SERVICE_ROLE_KEY"), auto_reconnect=True)
+        await self._client.connect()
+
+        channel = self._client.channel("api-message-feed")
+        channel.on_postgres_changes("INSERT", schema="public", table=Tables.MESSAGES, callback=self._on_message)
+        channel.on_postgres_changes(
+            "INSERT", schema="public", table=Tables.CONVERSATION_PARTICIPANTS, callback=self._on_participant
+        )
+        channel.on_postgres_changes(
+            "DELETE", schema="public", table=Tables.CONVERSATION_PARTICIPANTS, callback=self._on_participant_removed
+        )
+        for table in (Tables.SUBSCRIPTIONS, Tables.BILLING_HISTORY):
+            channel.on_postgres_changes("*", schema="public", table=table, callback=self._on_billing_change)
+        channel.on_postgres_changes(
+            "*", schema="public", table=Tables.SUBSCRIPTION_PLANS, callback=lambda payload: invalidate_entitlements()
+        )
+        await channel.subscribe()
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+    def _on_message(self, payload: dict) -> None:
+        message = payload["data"]["record"]
+        self.broker.publish(message)
+        # Unread counts and conversation details depend on the new message
+        task = asyncio.get_running_loop().create_task(message_inserted(message["conversation_id"]))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _on_participant(self, payload: dict) -> None:
+        participant = payload["data"]["record"]
+        self.broker.join(participant["user_id"], participant["conversation_id"])
+        # Cached details list the old members, so require_participant would 404 the new one
+        participants_changed(participant["conversation_id"], participant["user_id"])
+
+    def _on_participant_removed(self, payload: dict) -> None:
+        participant = payload["data"].get("old_record") or {}
+        if not participant.get("user_id") or not participant.get("conversation_id"):
+            logger.warning("Participant delete without user_id; is REPLICA IDENTITY FULL set?")
+            return
+        self.broker.leave(participant["user_id"], participant["conversation_id"])
+        participants_changed(participant["conversation_id"], participant["user_id"])
+
+    def _on_billing_change(self, payload: dict) -> None:
+        data = payload["data"]
+        # Deletes carry only the primary key unless the table has REPLICA IDENTITY FULL
+        user_id = (data.get("record") or data.get("old_record") or {}).get("user_id")
+        invalidate_entitlements(user_id)
+
+
+broker = InMemoryBroker()
+change_feed: Optional[SupabaseChangeFeed] = None
+
+async def start_realtime() -> None:
+    """
+    Start the shared change feed. With REALTIME_FEED=memory nothing is
+    started and messages reach the broker only through broker.publish().
+    """
+    global change_feed
+    if os.getenv("REALTIME_FEED", "supabase").lower() != "supabase":
+        return
+
+    change_feed = SupabaseChangeFeed(broker)
+    try:
+        await change_feed.start()
+    except Exception as e:
+        logger.warning(f"Realtime change feed unavailable: {e}")
+        await stop_realtime()
+
+async def stop_realtime() -> None:
+    global change_feed
+    if change_feed is not None:
+        await change_feed.close()
+        change_feed = None
+
+def _authenticate(token: Optional[str]) -> Tuple[str, Optional[float]]:
+    """Verify the connection token once and return the user id and token expiry"""
+    if not token:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Authorization required"
+        )
+    claims = supabase_client.verify_jwt(token)
+    return claims["sub"], claims.get("exp")
+
+async def _until_expired(expires_at: Optional[float]) -> None:
+    """Return when the connection's token expires; never if it has no expiry"""
+    if expires_at is None:
+        await asyncio.Event().wait()
+    await asyncio.sleep(max(0.0, expires_at - time.time()))
+
+def _bearer_token(request: Request) -> Optional[str]:
+    """Token from the Authorization header, or the token query parameter for EventSource/WebSocket clients"""
+    authorization = request.headers.get("authorization", "")
+    if authorization.lower().startswith("bearer "):
+        return authorization[7:]
+    return request.query_params.get("token")
+
+async def _user_conversation_ids(user_id: str) -> list:
+    result = await supabase_client.execute(
+        supabase_client.admin_client.table(Tables.CONVERSATION_PARTICIPANTS)
+        .select('conversation_id')
+        .eq('user_id', user_id)
+    )
+    return [row["conversation_id"] for row in result.data or []]
+
+async def _subscribe(user_id: str) -> Subscription:
+    return broker.subscribe(user_id, await _user_conversation_ids(user_id))
+
+@router.websocket("/ws")
+async def message_socket(websocket: WebSocket):
+    """
+    Push new messages of the user's conversations over a WebSocket.
+    Authenticate with ?token=<access token>. Each message is sent as
+    {"type": "message", "message": {...}}; {"type": "resync"} means some
+    messages were dropped and should be fetched from the history endpoint.
+    The socket is closed with 1008 when the token expires; reconnect with a
+    fresh token.
+    """
+    try:
+        user_id, expires_at = _authenticate(websocket.query_params.get("token"))
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+    subscription = await _subscribe(user_id)
+
+    async def drain_client():
+        # Incoming frames are ignored; this only notices the disconnect
+        with suppress(WebSocketDisconnect):
+            while True:
+                await websocket.receive_text()
+
+    receiver = asyncio.create_task(drain_client())
+    expiry = asyncio.create_task(_until_expired(expires_at))
+    try:
+        while not receiver.done():
+            getter = asyncio.create_task(subscription.get())
+            done, _ = await asyncio.wait({getter, receiver, expiry}, return_when=asyncio.FIRST_COMPLETED)
+            if getter not in done:
+                getter.cancel()
+                if expiry in done:
+                    await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Token expired")
+                break
+            await websocket.send_bytes(dumps({"type": "message", "message": getter.result()}))
+            if subscription.lagged:
+                subscription.lagged = False
+                await websocket.send_bytes(dumps({"type": "resync"}))
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiver.cancel()
+        expiry.cancel()
+        broker.unsubscribe(subscription)
+
+@router.get("/sse")
+async def message_events(request: Request):
+    """
+    Server-sent events stream of new messages in the user's conversations.
+    Authenticate with a Bearer header or ?token=. Events are "message",
+    "resync" and "expired", sent once before the stream ends when the token
+    expires; a comment is sent every REALTIME_SSE_KEEPALIVE seconds.
+    """
+    user_id, expires_at = _authenticate(_bearer_token(request))
+    subscription = await _subscribe(user_id)
+
+    async def generate():
+        try:
+            while not await request.is_disconnected():
+                timeout = SSE_KEEPALIVE
+                if expires_at is not None:
+                    if time.time() >= expires_at:
+                        yield b"event: expired\ndata: {}\n\n"
+                        break
+                    timeout = min(timeout, expires_at - time.time())
+                try:
+                    message = await asyncio.wait_for(subscription.get(), timeout)
+                except asyncio.TimeoutError:
+                    yield b": keep-alive\n\n"
+                    continue
+                yield b"event: message\nid: " + str(message.get("id", "")).encode() + b"\ndata: " + dumps(message) + b"\n\n"
+                if subscription.lagged:
+                    subscription.lagged = False
+                    yield b"event: resync\ndata: {}\n\n"
+        finally:
+            broker.unsubscribe(subscription)
+
+    return StreamingResponse(
+        generate(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
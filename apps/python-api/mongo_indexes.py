@@ -0,0 +1,74 @@
+import os
+import logging
+from typing import Optional
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+STATUS_CHECK_TTL_INDEX = "timestamp_ttl"
+
+# Indexes backing the queries the API runs against status_checks
+STATUS_CHECK_INDEXES = [
+    # Newest-first listing and keyset pagination on (timestamp, id)
+    IndexModel([("timestamp", DESCENDING), ("id", DESCENDING)], name="timestamp_desc_id_desc"),
+    IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+    IndexModel([("client_name", ASCENDING), ("timestamp", DESCENDING)], name="client_name_timestamp_desc"),
+]
+
+
+async def ensure_status_check_indexes(db) -> None:
+    """
+    Create the status_checks indexes if missing.
+    When STATUS_CHECK_RETENTION_DAYS is set, a TTL index on timestamp expires
+    old checks; unsetting it drops the TTL index again.
+    """
+    collection = db.status_checks
+    for index in STATUS_CHECK_INDEXES:
+        try:
+            await collection.create_indexes([index])
+        except OperationFailure as e:
+            logger.error(f"Could not create index {index.document['name']} on status_checks: {e}")
+
+    await ensure_ttl_index(collection, "timestamp", STATUS_CHECK_TTL_INDEX, status_check_retention_seconds())
+
+
+def status_check_retention_seconds() -> Optional[int]:
+    """How long status checks are kept (STATUS_CHECK_RETENTION_DAYS), or None to keep them forever"""
+    retention_days = os.environ.get('STATUS_CHECK_RETENTION_DAYS')
+    return int(float(retention_days) * 86400) if retention_days else None
+
+
+async def ensure_ttl_index(collection, field: str, name: str, expire_after: Optional[int]) -> None:
+    """Create or update the TTL index name on field, or drop it when expire_after is None"""
+    existing = await collection.index_information()
+    ttl_index = existing.get(name)
+
+    if expire_after is None:
+        if ttl_index:
+            await collection.drop_index(name)
+        return
+
+    if ttl_index is None:
+        await collection.create_index(
+            [(field, ASCENDING)],
+            name=name,
+            expireAfterSeconds=expire_after,
+        )
+    elif ttl_index.get("expireAfterSeconds") != expire_after:
+        await collection.database.command({
+            "collMod": collection.name,
+            "index": {"name": name, "expireAfterSeconds": expire_after},
+        })
+
+
+def summarize_explain(explain: dict) -> dict:
+    """Keep the parts of an explain() result that show index usage and cost"""
+    stats = explain.get("executionStats", {})
+    return {
+        "winningPlan": explain.get("queryPlanner", {}).get("winningPlan"),
+        "nReturned": stats.get("nReturned"),
+        "totalKeysExamined": stats.get("totalKeysExamined"),
+        "totalDocsExamined": stats.get("totalDocsExamined"),
+        "executionTimeMillis": stats.get("executionTimeMillis"),
+    }
@@ -0,0 +1,99 @@
+import os
+import threading
+import time
+from pymongo import monitoring
+
+
+def mongo_pool_options() -> dict:
+    """Read Motor connection pool settings from the environment"""
+    options = {"maxPoolSize": int(os.environ.get('MONGO_MAX_POOL_SIZE', '100'))}
+    optional = {
+        "minPoolSize": 'MONGO_MIN_POOL_SIZE',
+        "maxIdleTimeMS": 'MONGO_MAX_IDLE_TIME_MS',
+        "waitQueueTimeoutMS": 'MONGO_WAIT_QUEUE_TIMEOUT_MS',
+    }
+    for option, env_name in optional.items():
+        if os.environ.get(env_name):
+            options[option] = int(os.environ[env_name])
+    return options
+
+
+class PoolWaitListener(monitoring.ConnectionPoolListener):
+    """
+    Records how long operations wait to check a connection out of the pool.
+    Motor runs each operation on a worker thread, so check-out start and
+    completion are paired per thread.
+    """
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.failed_checkouts = 0
+        self.checked_out = 0
+        self.open_connections = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+
+    def _record_wait(self) -> float:
+        started = getattr(self._local, "started", None)
+        self._local.started = None
+        return time.perf_counter() - started if started is not None else 0.0
+
+    def connection_check_out_started(self, event):
+        self._local.started = time.perf_counter()
+
+    def connection_checked_out(self, event):
+        waited = self._record_wait()
+        with self._lock:
+            self.checkouts += 1
+            self.checked_out += 1
+            self.wait_time_total += waited
+            self.wait_time_max = max(self.wait_time_max, waited)
+
+    def connection_check_out_failed(self, event):
+        waited = self._record_wait()
+        with self._lock:
+            self.failed_checkouts += 1
+            self.wait_time_total += waited
+            self.wait_time_max = max(self.wait_time_max, waited)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out -= 1
+
+    def connection_created(self, event):
+        with self._lock:
+            self.open_connections += 1
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.open_connections -= 1
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def stats(self) -> dict:
+        """Return pool usage and checkout wait time counters"""
+        with self._lock:
+            attempts = self.checkouts + self.failed_checkouts
+            return {
+                "open_connections": self.open_connections,
+                "in_use": self.checked_out,
+                "checkouts": self.checkouts,
+                "failed_checkouts": self.failed_checkouts,
+                "wait_time_total": self.wait_time_total,
+                "wait_time_avg": self.wait_time_total / attempts if attempts else 0.0,
+                "wait_time_max": self.wait_time_max,
+            }
@@ -0,0 +1,65 @@
+import base64
+import json
+import uuid
+from typing import Any, Callable, Optional, Tuple
+from fastapi import HTTPException, status
+
+
+def encode_cursor(values: dict) -> str:
+    """Encode keyset position values into an opaque URL-safe cursor"""
+    raw = json.dumps(values, separators=(",", ":"), default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, *keys: str) -> dict:
+    """
+    Decode a cursor produced by encode_cursor.
+    Raises HTTPException 400 if it is malformed or missing any of the given keys.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        values = None
+
+    if not isinstance(values, dict) or any(key not in values for key in keys):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+    return values
+
+
+def keyset_cursor(row: dict, column: str) -> str:
+    """Cursor pointing at row in (column, id) order"""
+    return encode_cursor({column: row[column], "id": row["id"]})
+
+
+def decode_keyset_cursor(cursor: str, column: str, parse: Callable[[str], Any]) -> Tuple[str, str]:
+    """
+    Decode and validate a (column, id) cursor. The column value is parsed with
+    parse (e.g. date.fromisoformat) and the id must be a UUID; both are
+    returned in canonical form. Raises HTTPException 400 otherwise.
+    """
+    position = decode_cursor(cursor, column, "id")
+    try:
+        return parse(position[column]).isoformat(), str(uuid.UUID(position["id"]))
+    except (AttributeError, TypeError, ValueError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+
+def keyset_page(query, column: str, position: Optional[Tuple[str, str]], ascending: bool):
+    """
+    Order a PostgREST query by (column, id) and, given a position, keep only
+    the rows after it in that order. The column value is quoted so
+    timestamps with ':' and '+' are safe inside or=().
+    """
+    op = "gt" if ascending else "lt"
+    if position:
+        value, row_id = position
+        query = query.or_(f'{column}.{op}."{value}",and({column}.eq."{value}",id.{op}.{row_id})')
+    return query.order(column, desc=not ascending).order('id', desc=not ascending)
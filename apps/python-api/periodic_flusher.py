@@ -0,0 +1,143 @@
+import asyncio
+import logging
+import httpx
+from abc import ABC, abstractmethod
+from contextlib import suppress
+from typing import Hashable, Optional
+from postgrest.exceptions import APIError
+
+logger = logging.getLogger(__name__)
+
+
+def write_not_applied(error: Exception) -> bool:
+    """
+    True when a failed write certainly did not reach the database: no
+    connection was made, or PostgREST answered with an error (the statement
+    was rolled back). Timeouts, 504s and gateway errors without a PostgREST
+    body are ambiguous, since the write may still have been applied.
+    """
+    if isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)):
+        return True
+    return isinstance(error, APIError) and isinstance(error.code, str)
+
+
+class PeriodicFlusher(ABC):
+    """
+    Base for buffers that coalesce writes per key in process.
+    Subclasses define _combine(current, value), which folds a new value into
+    a pending one, and _write(batch), which writes up to batch_size
+    (key, value) pairs. Every flush_interval seconds, and on close(), the
+    pending entries are written batch by batch.
+    A failed batch is merged back for the next flush when it was certainly
+    not applied, or always when idempotent is set (applying it twice gives
+    the same result); otherwise it is discarded rather than risk applying
+    it twice.
+    close() lets a flush already in progress finish before the final flush,
+    so nothing pending is lost on shutdown.
+    """
+    def __init__(self, name: str, flush_interval: float, max_pending: int, batch_size: int, idempotent: bool = False):
+        self.name = name
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.idempotent = idempotent
+        self._pending: dict = {}
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = asyncio.Event()
+        self.flushes = 0
+        self.written = 0
+        self.failed = 0
+        self.requeued = 0
+        self.discarded = 0
+
+    def start(self) -> None:
+        """Start the periodic flusher on the running event loop"""
+        if self._task is None:
+            self._stopping.clear()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def close(self) -> None:
+        """Stop the flusher and write everything still pending"""
+        if self._task is not None:
+            # Not cancelled: a flush in progress holds entries taken out of _pending
+            self._stopping.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+    async def flush(self) -> None:
+        """Write all pending entries now"""
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        items = list(pending.items())
+        for start in range(0, len(items), self.batch_size):
+            batch = items[start:start + self.batch_size]
+            self.flushes += 1
+            try:
+                await self._write(batch)
+            except asyncio.CancelledError:
+                # Later batches were never sent; the current one follows the retry rule
+                self._merge_back(items[start + self.batch_size:])
+                if self.idempotent:
+                    self._merge_back(batch)
+                else:
+                    logger.error(f"{self.name} flush of {len(batch)} entries was cancelled and may have been applied, discarding it")
+                    self.discarded += len(batch)
+                raise
+            except Exception as e:
+                self.failed += 1
+                if self.idempotent or write_not_applied(e):
+                    logger.error(f"{self.name} flush of {len(batch)} entries failed, retrying on the next flush: {e}")
+                    self._merge_back(batch)
+                else:
+                    logger.error(f"{self.name} flush of {len(batch)} entries failed and may have been applied, discarding it: {e}")
+                    self.discarded += len(batch)
+                continue
+            self.written += len(batch)
+            await self._flushed(batch)
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self._pending),
+            "flushes": self.flushes,
+            "written": self.written,
+            "failed": self.failed,
+            "requeued": self.requeued,
+            "discarded": self.discarded,
+        }
+
+    def _merge(self, key: Hashable, value) -> bool:
+        """Fold value into the pending entry for key. False if key is new and the buffer is full."""
+        if key in self._pending:
+            self._pending[key] = self._combine(self._pending[key], value)
+            return True
+        if len(self._pending) >= self.max_pending:
+            return False
+        self._pending[key] = value
+        return True
+
+    def _merge_back(self, batch: list) -> None:
+        # Entries added since the flush started are newer and are combined with the batch
+        for key, value in batch:
+            if self._merge(key, value):
+                self.requeued += 1
+            else:
+                self.discarded += 1
+
+    @abstractmethod
+    def _combine(self, current, value):
+        """Fold value into the pending value current"""
+
+    @abstractmethod
+    async def _write(self, batch: list) -> None:
+        """Write a batch of (key, value) pairs; raise if the write failed"""
+
+    async def _flushed(self, batch: list) -> None:
+        """Called after batch was written"""
+
+    async def _run(self) -> None:
+        while not self._stopping.is_set():
+            with suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._stopping.wait(), self.flush_interval)
+            await self.flush()
@@ -0,0 +1,71 @@
+import logging
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Optional
+from periodic_flusher import PeriodicFlusher
+from supabase_client import supabase_client
+
+logger = logging.getLogger(__name__)
+
+
+class PresenceTracker(PeriodicFlusher):
+    """
+    Coalesces conversation_participants.last_seen updates in process.
+    touch() only records the latest timestamp per (conversation, user); every
+    flush_interval seconds the pending updates are written with one
+    update_last_seen_batch RPC per batch_size rows, so presence costs a fixed
+    write rate however often clients report reads or heartbeats.
+    Updates for new keys are dropped while max_pending keys are queued.
+    last_seen never moves backwards, so failed batches are always retried.
+    on_flush, if given, is awaited with the (conversation, user) keys written.
+    """
+    def __init__(
+        self,
+        flush_interval: float = 2.0,
+        max_pending: int = 50000,
+        batch_size: int = 1000,
+        on_flush: Optional[Callable[[list], Awaitable[None]]] = None,
+    ):
+        super().__init__('update_last_seen_batch', flush_interval, max_pending, batch_size, idempotent=True)
+        self.on_flush = on_flush
+        self.received = 0
+        self.merged = 0
+        self.dropped = 0
+
+    def touch(self, conversation_id: str, user_id: str, seen_at: Optional[datetime] = None) -> bool:
+        """Record that user_id has seen conversation_id. Returns False if the update was dropped."""
+        seen_at = seen_at or datetime.now(timezone.utc)
+        key = (conversation_id, user_id)
+        self.received += 1
+        if key in self._pending:
+            self.merged += 1
+        if not self._merge(key, seen_at):
+            self.dropped += 1
+            return False
+        return True
+
+    def stats(self) -> dict:
+        return {
+            **super().stats(),
+            "received": self.received,
+            "merged": self.merged,
+            "dropped": self.dropped,
+        }
+
+    def _combine(self, current: datetime, seen_at: datetime) -> datetime:
+        return max(current, seen_at)
+
+    async def _write(self, batch: list) -> None:
+        updates = [
+            {"conversation_id": conversation_id, "user_id": user_id, "last_seen": seen_at.isoformat()}
+            for (conversation_id, user_id), seen_at in batch
+        ]
+        await supabase_client.execute(
+            supabase_client.admin_client.rpc('update_last_seen_batch', {'updates': updates})
+        )
+
+    async def _flushed(self, batch: list) -> None:
+        if self.on_flush is not None:
+            try:
+                await self.on_flush([key for key, _ in batch])
+            except Exception as e:
+                logger.error(f"Presence flush hook failed: {e}")
@@ -0,0 +1,102 @@
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from contextlib import suppress
+from typing import Optional, Tuple
+from supabase_client import supabase_client
+
+logger = logging.getLogger(__name__)
+
+
+async def fetch_table_version(table: str) -> str:
+    """
+    Cheap change marker for a table: its row count and latest updated_at.
+    Inserts and updates move updated_at; deletes change the count.
+    """
+    result = await supabase_client.execute(
+        supabase_client.admin_client.table(table)
+        .select('updated_at', count='exact')
+        .order('updated_at', desc=True)
+        .limit(1)
+    )
+    latest = result.data[0]["updated_at"] if result.data else ""
+    return f"{result.count or 0}:{latest}"
+
+
+class BackgroundRefresher(ABC):
+    """
+    Base for in-process read models kept fresh by a background task.
+    start() runs refresh() once and then every refresh_interval seconds
+    until close(); failures are logged and retried on the next interval.
+    """
+    def __init__(self, name: str, refresh_interval: float):
+        self.name = name
+        self.refresh_interval = refresh_interval
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        """Load the first snapshot and start the background refresher"""
+        try:
+            await self.refresh()
+        except Exception as e:
+            logger.warning(f"{self.name} preload failed: {e}")
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    @abstractmethod
+    async def refresh(self):
+        """Bring the read model up to date"""
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"{self.name} refresh failed: {e}")
+
+
+class VersionedSnapshot(BackgroundRefresher):
+    """
+    Background refresher holding one immutable snapshot built from tables.
+    Each refresh compares the tables' versions with the snapshot's and calls
+    _load(version) only when one of them changed.
+    """
+    def __init__(self, name: str, tables: Tuple[str, ...], refresh_interval: float):
+        super().__init__(name, refresh_interval)
+        self.tables = tables
+        self.snapshot = None
+        self._lock = asyncio.Lock()
+        self.checks = 0
+        self.reloads = 0
+
+    async def get(self):
+        """Current snapshot, loading it on first use"""
+        if self.snapshot is None:
+            async with self._lock:
+                if self.snapshot is None:
+                    await self.refresh(force=True)
+        return self.snapshot
+
+    async def refresh(self, force: bool = False) -> bool:
+        """Reload the snapshot if the tables changed; returns True if reloaded"""
+        self.checks += 1
+        versions = await asyncio.gather(*(fetch_table_version(table) for table in self.tables))
+        version = "|".join(versions)
+        if not force and self.snapshot is not None and self.snapshot.version == version:
+            return False
+
+        self.snapshot = await self._load(version)
+        self.reloads += 1
+        return True
+
+    @abstractmethod
+    async def _load(self, version: str):
+        """Build the snapshot for version"""
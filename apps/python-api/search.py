@@ -0,0 +1,321 @@
+import os
+import re
+import math
+import heapq
+import asyncio
+import bisect
+import unicodedata
+from datetime import datetime, timedelta
+from collections import Counter, defaultdict
+from typing import Callable, Dict, List, NamedTuple, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from auth_middleware import get_current_user, require_admin
+from refresher import BackgroundRefresher
+from supabase_client import supabase_client, Tables
+
+router = APIRouter(prefix="/search", tags=["search"])
+
+SEARCH_REFRESH = float(os.getenv("SEARCH_REFRESH", "60"))
+SEARCH_PAGE_SIZE = 1000
+# Incremental refreshes re-read rows this far behind the newest updated_at
+# seen, so rows committed late with an older timestamp are still picked up
+SEARCH_OVERLAP = float(os.getenv("SEARCH_OVERLAP_SECONDS", "300"))
+# Ids per in.() lookup when indexing rows the incremental refresh missed
+SEARCH_ID_BATCH = 200
+# Vocabulary terms a query token may expand to by prefix
+PREFIX_EXPANSIONS = 50
+# Score multiplier for prefix (non-exact) term matches
+PREFIX_WEIGHT = 0.7
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+STOPWORDS = frozenset("""
+a ao aos as com como da das de do dos e em na nas no nos o os ou para pela pelas
+pelo pelos por que se sem sua suas seu seus um uma umas uns eu voce voces ele ela
+eles elas isso isto esse essa este esta ja mais mas nao muito tem ter ser sao foi
+""".split())
+
+
+def normalize(text: str) -> str:
+    """Casefold and strip accents, so "Ação" and "acao" compare equal"""
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Accent-insensitive Portuguese tokens without stopwords"""
+    if not text:
+        return []
+    return [token for token in TOKEN_PATTERN.findall(normalize(text)) if token not in STOPWORDS]
+
+
+def _overlap_start(since: Optional[str]) -> Optional[str]:
+    """The incremental read watermark, moved back by SEARCH_OVERLAP"""
+    if not since:
+        return since
+    try:
+        return (datetime.fromisoformat(since) - timedelta(seconds=SEARCH_OVERLAP)).isoformat()
+    except ValueError:
+        return since
+
+
+class SearchSource(NamedTuple):
+    """A table indexed for search and how its rows become documents"""
+    table: str
+    columns: str
+    is_active: Callable[[dict], bool]
+    # Field name -> BM25 term weight
+    fields: Dict[str, float]
+    # Fields returned with each hit
+    display: tuple
+
+
+SEARCH_SOURCES = {
+    "track": SearchSource(
+        Tables.TRACKS,
+        "id,title,description,tags,difficulty,background_image,is_published,updated_at",
+        lambda row: bool(row.get("is_published")),
+        {"title": 3.0, "tags": 2.0, "description": 1.0},
+        ("title", "description", "difficulty", "background_image"),
+    ),
+    "tool": SearchSource(
+        Tables.TOOLS,
+        "id,name,description,category,icon,is_premium,is_active,updated_at",
+        lambda row: bool(row.get("is_active")),
+        {"name": 3.0, "category": 2.0, "description": 1.0},
+        ("name", "description", "category", "icon", "is_premium"),
+    ),
+    "faq": SearchSource(
+        Tables.FAQ_ITEMS,
+        "id,category_id,question,answer,tags,is_active,updated_at",
+        lambda row: bool(row.get("is_active")),
+        {"question": 3.0, "tags": 2.0, "answer": 1.0},
+        ("question", "answer", "category_id"),
+    ),
+}
+
+
+class InvertedIndex:
+    """
+    BM25 inverted index over weighted document fields.
+    Documents can be added and removed one at a time; the vocabulary is kept
+    sorted so prefix lookups are a bisect plus a short scan.
+    """
+    def __init__(self):
+        self.postings: Dict[str, Dict[tuple, float]] = defaultdict(dict)
+        self.terms: Dict[tuple, List[str]] = {}
+        self.lengths: Dict[tuple, float] = {}
+        self.documents: Dict[tuple, dict] = {}
+        self.vocabulary: List[str] = []
+        self.total_length = 0.0
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def add(self, key: tuple, fields: Dict[str, tuple], document: dict) -> None:
+        """Index a document; fields maps name -> (text, weight). Replaces any previous version."""
+        self.remove(key)
+        frequencies = Counter()
+        for value, weight in fields.values():
+            text = " ".join(value) if isinstance(value, list) else value
+            for token in tokenize(text):
+                frequencies[token] += weight
+        if not frequencies:
+            return
+
+        for term, frequency in frequencies.items():
+            if term not in self.postings:
+                bisect.insort(self.vocabulary, term)
+            self.postings[term][key] = frequency
+        length = sum(frequencies.values())
+        self.terms[key] = list(frequencies)
+        self.lengths[key] = length
+        self.total_length += length
+        self.documents[key] = document
+
+    def remove(self, key: tuple) -> None:
+        length = self.lengths.pop(key, None)
+        if length is None:
+            return
+        self.total_length -= length
+        del self.documents[key]
+        for term in self.terms.pop(key):
+            postings = self.postings[term]
+            del postings[key]
+            if not postings:
+                del self.postings[term]
+                del self.vocabulary[bisect.bisect_left(self.vocabulary, term)]
+
+    def expand(self, token: str) -> Dict[str, float]:
+        """The token itself plus up to PREFIX_EXPANSIONS vocabulary terms it prefixes"""
+        terms = {token: 1.0} if token in self.postings else {}
+        position = bisect.bisect_left(self.vocabulary, token)
+        for term in self.vocabulary[position:position + PREFIX_EXPANSIONS + 1]:
+            if not term.startswith(token):
+                break
+            terms.setdefault(term, PREFIX_WEIGHT)
+        return terms
+
+    def search(self, query: str, limit: int, kinds: Optional[set] = None) -> list:
+        """Top documents for query as (score, key) pairs, best first"""
+        count = len(self.documents)
+        if not count:
+            return []
+        average_length = self.total_length / count
+        scores = defaultdict(float)
+        for token in dict.fromkeys(tokenize(query)):
+            for term, boost in self.expand(token).items():
+                postings = self.postings[term]
+                idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for key, frequency in postings.items():
+                    if kinds and key[0] not in kinds:
+                        continue
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[key] / average_length)
+                    scores[key] += boost * idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+        return heapq.nlargest(limit, ((score, key) for key, score in scores.items()))
+
+
+class ContentSearch(BackgroundRefresher):
+    """
+    Search index over tracks, tools and FAQ items kept in process.
+    Every refresh_interval seconds each source is read incrementally from
+    its latest updated_at, so only changed rows are re-indexed; rows that
+    became inactive are removed. When a source's row count no longer matches
+    the ids are listed once: missing documents are dropped and rows the
+    incremental reads never returned are fetched by id and indexed.
+    """
+    def __init__(self, sources: Dict[str, SearchSource] = SEARCH_SOURCES, refresh_interval: float = SEARCH_REFRESH):
+        super().__init__("Search index", refresh_interval)
+        self.sources = sources
+        self.index = InvertedIndex()
+        self._since: Dict[str, Optional[str]] = {kind: None for kind in sources}
+        # Row id -> updated_at of the version indexed
+        self._known: Dict[str, dict] = {kind: {} for kind in sources}
+        self._lock = asyncio.Lock()
+        self.refreshes = 0
+        self.rows_indexed = 0
+
+    async def refresh(self, full: bool = False) -> int:
+        """
+        Apply changes since the last refresh; returns the number of rows re-indexed.
+        With full=True the index is rebuilt aside and swapped in when complete.
+        """
+        async with self._lock:
+            target = ContentSearch(self.sources) if full else self
+            changed = 0
+            for kind, source in self.sources.items():
+                changed += await target._refresh_source(kind, source)
+            if full:
+                self.index, self._since, self._known = target.index, target._since, target._known
+            self.refreshes += 1
+            self.rows_indexed += changed
+            return changed
+
+    def search(self, query: str, limit: int, kinds: Optional[set] = None) -> list:
+        return [
+            {"type": key[0], "id": key[1], "score": round(score, 4), **self.index.documents[key]}
+            for score, key in self.index.search(query, limit, kinds)
+        ]
+
+    def stats(self) -> dict:
+        return {
+            "documents": len(self.index),
+            "terms": len(self.index.vocabulary),
+            "refreshes": self.refreshes,
+            "rows_indexed": self.rows_indexed,
+            "since": dict(self._since),
+        }
+
+    async def _refresh_source(self, kind: str, source: SearchSource) -> int:
+        changed = 0
+        for row in await self._fetch_pages(source.table, source.columns, _overlap_start(self._since[kind])):
+            changed += self._index_row(kind, source, row)
+
+        count = await supabase_client.execute(
+            supabase_client.admin_client.table(source.table).select('id', count='exact').limit(1)
+        )
+        known = self._known[kind]
+        if count.count is not None and count.count != len(known):
+            # Rows were hard-deleted, or committed with an updated_at older than the overlap
+            existing = {row["id"] for row in await self._fetch_pages(source.table, 'id,updated_at', None)}
+            for id_ in known.keys() - existing:
+                self.index.remove((kind, id_))
+                del known[id_]
+            unknown = list(existing - known.keys())
+            for start in range(0, len(unknown), SEARCH_ID_BATCH):
+                result = await supabase_client.execute(
+                    supabase_client.admin_client.table(source.table)
+                    .select(source.columns)
+                    .in_('id', unknown[start:start + SEARCH_ID_BATCH])
+                )
+                for row in result.data or []:
+                    changed += self._index_row(kind, source, row)
+
+        return changed
+
+    async def _fetch_pages(self, table: str, columns: str, since: Optional[str]) -> list:
+        rows = []
+        while True:
+            query = supabase_client.admin_client.table(table).select(columns)
+            if since:
+                # gte: rows sharing the last timestamp are re-indexed, never missed
+                query = query.gte('updated_at', since)
+            result = await supabase_client.execute(
+                query.order('updated_at').order('id').range(len(rows), len(rows) + SEARCH_PAGE_SIZE - 1)
+            )
+            rows.extend(result.data or [])
+            if len(result.data or []) < SEARCH_PAGE_SIZE:
+                return rows
+
+    def _index_row(self, kind: str, source: SearchSource, row: dict) -> bool:
+        """Index or drop a row; returns False if this version was already indexed"""
+        key = (kind, row["id"])
+        updated_at = row.get("updated_at")
+        if updated_at and (self._since[kind] is None or updated_at > self._since[kind]):
+            self._since[kind] = updated_at
+        if row["id"] in self._known[kind] and self._known[kind][row["id"]] == updated_at:
+            return False
+        self._known[kind][row["id"]] = updated_at
+
+        if not source.is_active(row):
+            self.index.remove(key)
+            return True
+        self.index.add(
+            key,
+            {field: (row.get(field) or "", weight) for field, weight in source.fields.items()},
+            {field: row.get(field) for field in source.display},
+        )
+        return True
+
+
+content_search = ContentSearch()
+
+@router.get("")
+async def search(
+    q: str = Query(..., min_length=1, max_length=200),
+    types: Optional[List[str]] = Query(None),
+    limit: int = Query(20, ge=1, le=50),
+    current_user: dict = Depends(get_current_user),
+):
+    """
+    Search tracks, tools and FAQ items.
+    Matching is accent-insensitive, every query word also matches words it
+    prefixes, and results are ranked with BM25. types may be repeated or
+    comma-separated (track, tool, faq).
+    """
+    kinds = {kind for value in types or [] for kind in value.split(",") if kind}
+    unknown = kinds - set(SEARCH_SOURCES)
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown search types: {', '.join(sorted(unknown))}"
+        )
+    return {"query": q, "results": content_search.search(q, limit, kinds or None)}
+
+@router.post("/reindex")
+async def reindex(current_user: dict = Depends(require_admin)):
+    """Rebuild the search index from scratch"""
+    await content_search.refresh(full=True)
+    return content_search.stats()
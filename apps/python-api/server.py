@@ -1,26 +1,109 @@
-from fastapi import FastAPI, APIRouter
+from fastapi import FastAPI, APIRouter, Depends, HTTPException, Query, status
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
+import asyncio
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field
-from typing import List
+from typing import List, Literal, Optional
 import uuid
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
+from contextlib import asynccontextmanager
+from pagination import encode_cursor, decode_cursor
+from json_response import json_list_response, ndjson_response
+from write_buffer import WriteBuffer
+from supabase_client import supabase_client, warm_up_supabase_client, close_supabase_client
+from mongo_pool import mongo_pool_options, PoolWaitListener
+from mongo_indexes import ensure_status_check_indexes, status_check_retention_seconds, summarize_explain
+from status_stats import (
+    HISTOGRAM_INTERVALS, HISTOGRAM_MAX_BUCKETS, StatusRollups,
+    bucket_start, client_stats_pipeline, histogram_pipeline,
+)
+from auth_middleware import require_admin, get_current_user, get_user_entitlements
+from conversations import router as conversations_router, presence_tracker
+from message_gateway import router as realtime_router, broker, start_realtime, stop_realtime
+from tracks import router as tracks_router, track_catalog
+from search import router as search_router, content_search
+from help_center import router as help_router, faq_view_counter, help_center
+from billing import router as billing_router
 
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
+# MongoDB connection, created per process in the app lifespan
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+mongo_pool_listener = PoolWaitListener()
+client: Optional[AsyncIOMotorClient] = None
+db = None
+
+# Write-behind buffer for status check ingestion
+status_writer: Optional[WriteBuffer] = None
+
+# Incrementally maintained aggregates, enabled with STATUS_ROLLUPS=true
+status_rollups: Optional[StatusRollups] = None
+
+async def prewarm_mongo_pool(size: int):
+    """Open up to size pooled connections by running concurrent pings"""
+    await asyncio.gather(*(client.admin.command('ping') for _ in range(size)))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global client, db, status_writer, status_rollups
+
+    pool_options = mongo_pool_options()
+    client = AsyncIOMotorClient(mongo_url, event_listeners=[mongo_pool_listener], **pool_options)
+    db = client[os.environ['DB_NAME']]
+
+    if os.environ.get('MONGO_ENSURE_INDEXES', 'true').lower() in ('1', 'true', 'yes'):
+        try:
+            await ensure_status_check_indexes(db)
+        except Exception as e:
+            logger.error(f"Index bootstrap for status_checks failed: {e}")
+
+    min_pool_size = pool_options.get('minPoolSize', 0)
+    if min_pool_size and os.environ.get('MONGO_PREWARM', 'false').lower() in ('1', 'true', 'yes'):
+        try:
+            await prewarm_mongo_pool(min_pool_size)
+        except Exception as e:
+            logger.warning(f"MongoDB pool pre-warm failed: {e}")
+
+    if os.environ.get('STATUS_ROLLUPS', 'false').lower() in ('1', 'true', 'yes'):
+        status_rollups = StatusRollups(db, status_check_retention_seconds())
+        await status_rollups.initialize()
+
+    status_writer = WriteBuffer(
+        db.status_checks,
+        batch_size=int(os.environ.get('STATUS_WRITE_BATCH_SIZE', '500')),
+        flush_interval=float(os.environ.get('STATUS_WRITE_FLUSH_MS', '100')) / 1000,
+        max_pending=int(os.environ.get('STATUS_WRITE_MAX_PENDING', '10000')),
+        on_flush=status_rollups.apply if status_rollups else None,
+    )
+    status_writer.start()
+    presence_tracker.start()
+    faq_view_counter.start()
+    await warm_up_supabase_client()
+    await start_realtime()
+    await track_catalog.start()
+    await content_search.start()
+    await help_center.start()
+
+    yield
+
+    await help_center.close()
+    await content_search.close()
+    await track_catalog.close()
+    await stop_realtime()
+    await status_writer.close()
+    await presence_tracker.close()
+    await faq_view_counter.close()
+    client.close()
+    close_supabase_client()
 
 # Create the main app without a prefix
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -35,24 +118,202 @@ class StatusCheck(BaseModel):
 class StatusCheckCreate(BaseModel):
     client_name: str
 
+# Pagination settings for list endpoints
+STATUS_PAGE_DEFAULT = 100
+STATUS_PAGE_MAX = 1000
+STATUS_STREAM_BATCH_SIZE = 500
+
+def _status_keyset_filter(cursor: Optional[str]) -> dict:
+    """Build the filter for rows strictly after the cursor in (timestamp, id) DESC order"""
+    if not cursor:
+        return {}
+
+    position = decode_cursor(cursor, "timestamp", "id")
+    try:
+        timestamp = datetime.fromisoformat(position["timestamp"])
+    except (TypeError, ValueError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+    return {
+        "$or": [
+            {"timestamp": {"$lt": timestamp}},
+            {"timestamp": timestamp, "id": {"$lt": position["id"]}},
+        ]
+    }
+
+def _status_list_query(cursor: Optional[str]):
+    """The newest-first keyset query used by GET /status"""
+    return db.status_checks.find(
+        _status_keyset_filter(cursor),
+        {"_id": 0},
+        sort=[("timestamp", -1), ("id", -1)],
+    )
+
+def _status_cursor(status_check: dict) -> str:
+    return encode_cursor({
+        "timestamp": status_check["timestamp"].isoformat(),
+        "id": status_check["id"],
+    })
+
 # Add your routes to the router instead of directly to app
 @api_router.get("/")
 async def root():
     return {"message": "Hello World"}
 
 @api_router.post("/status", response_model=StatusCheck)
-async def create_status_check(input: StatusCheckCreate):
+async def create_status_check(input: StatusCheckCreate, ack: bool = False):
+    """
+    Queue a status check for a batched write.
+    With ack=true, respond only after the batch has been written.
+    """
     status_dict = input.dict()
     status_obj = StatusCheck(**status_dict)
-    _ = await db.status_checks.insert_one(status_obj.dict())
+    await status_writer.add(status_obj.dict(), wait=ack)
     return status_obj
 
 @api_router.get("/status", response_model=List[StatusCheck])
-async def get_status_checks():
-    status_checks = await db.status_checks.find().to_list(1000)
-    return [StatusCheck(**status_check) for status_check in status_checks]
+async def get_status_checks(
+    limit: Optional[int] = Query(None, ge=1, le=STATUS_PAGE_MAX),
+    cursor: Optional[str] = None,
+    stream: bool = False,
+):
+    """
+    List status checks newest first using keyset pagination.
+    The cursor for the next page is returned in the X-Next-Cursor header.
+    With stream=true, rows after the cursor are streamed as NDJSON.
+    Rows are serialized straight from Motor documents, which are written
+    through the StatusCheck model and need no re-validation.
+    """
+    query = _status_list_query(cursor)
+
+    if stream:
+        if limit:
+            query = query.limit(limit)
+        return ndjson_response(query.batch_size(STATUS_STREAM_BATCH_SIZE))
+
+    page_size = limit or STATUS_PAGE_DEFAULT
+    status_checks = await query.limit(page_size + 1).to_list(page_size + 1)
+    headers = {}
+    if len(status_checks) > page_size:
+        status_checks = status_checks[:page_size]
+        headers["X-Next-Cursor"] = _status_cursor(status_checks[-1])
+
+    return json_list_response(status_checks, headers=headers)
+
+def _naive_utc(value: datetime) -> datetime:
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+@api_router.get("/status/stats/clients")
+async def get_status_client_stats():
+    """Number of checks and last-seen timestamp per client_name"""
+    if status_rollups:
+        rows = await status_rollups.client_stats()
+    else:
+        rows = await db.status_checks.aggregate(client_stats_pipeline()).to_list(None)
+    return json_list_response(rows)
+
+@api_router.get("/status/stats/histogram")
+async def get_status_histogram(
+    interval: Literal["minute", "hour"] = "hour",
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    client_name: Optional[str] = None,
+):
+    """
+    Number of checks per minute or hour over [since, until).
+    Defaults to the last 60 minutes or 24 hours; since is aligned to the bucket start.
+    """
+    seconds = HISTOGRAM_INTERVALS[interval]
+    until = _naive_utc(until) if until else datetime.utcnow()
+    since = _naive_utc(since) if since else until - timedelta(seconds=seconds * (60 if interval == "minute" else 24))
+    since = bucket_start(since, seconds)
+
+    if since >= until or (until - since).total_seconds() / seconds > HISTOGRAM_MAX_BUCKETS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Time range must be positive and span at most {HISTOGRAM_MAX_BUCKETS} buckets"
+        )
+
+    if status_rollups:
+        rows = await status_rollups.histogram(interval, since, until, client_name)
+    else:
+        rows = await db.status_checks.aggregate(
+            histogram_pipeline(interval, since, until, client_name)
+        ).to_list(None)
+    return json_list_response(rows)
+
+@api_router.post("/status/stats/rebuild")
+async def rebuild_status_rollups(current_user: dict = Depends(require_admin)):
+    """Recompute the status rollup collections from status_checks"""
+    if not status_rollups:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Status rollups are not enabled"
+        )
+    await status_rollups.rebuild()
+    return {"message": "Status rollups rebuilt"}
+
+@api_router.get("/status/explain")
+async def explain_status_queries(current_user: dict = Depends(require_admin)):
+    """Report query plans for the status_checks queries the API runs"""
+    newest = await db.status_checks.find_one({}, {"_id": 0}, sort=[("timestamp", -1), ("id", -1)])
+    sample_cursor = _status_cursor(newest) if newest else None
+    page_size = STATUS_PAGE_DEFAULT + 1
+
+    return {
+        "indexes": await db.status_checks.index_information(),
+        "plans": {
+            "list_first_page": summarize_explain(
+                await _status_list_query(None).limit(page_size).explain()
+            ),
+            "list_next_page": summarize_explain(
+                await _status_list_query(sample_cursor).limit(page_size).explain()
+            ),
+        },
+    }
+
+@api_router.get("/entitlements")
+async def get_entitlements(current_user: dict = Depends(get_current_user)):
+    """Current user's active plan and features"""
+    return await get_user_entitlements(current_user["id"])
+
+@api_router.get("/metrics/mongo")
+async def get_mongo_pool_metrics(current_user: dict = Depends(require_admin)):
+    """Report MongoDB pool usage and connection checkout wait times"""
+    return {"pool_options": mongo_pool_options(), **mongo_pool_listener.stats()}
+
+@api_router.get("/metrics/supabase")
+async def get_supabase_pool_metrics(current_user: dict = Depends(require_admin)):
+    """Report Supabase HTTP pool usage and connection wait times"""
+    return supabase_client.pool_stats()
+
+@api_router.get("/metrics/presence")
+async def get_presence_metrics(current_user: dict = Depends(require_admin)):
+    """Report coalesced last_seen update counters"""
+    return presence_tracker.stats()
+
+@api_router.get("/metrics/faq-views")
+async def get_faq_view_metrics(current_user: dict = Depends(require_admin)):
+    """Report buffered FAQ view counters"""
+    return faq_view_counter.stats()
+
+@api_router.get("/metrics/realtime")
+async def get_realtime_metrics(current_user: dict = Depends(require_admin)):
+    """Report realtime gateway connections and fan-out counters"""
+    return broker.stats()
 
 # Include the router in the main app
+api_router.include_router(conversations_router)
+api_router.include_router(realtime_router)
+api_router.include_router(tracks_router)
+api_router.include_router(search_router)
+api_router.include_router(help_router)
+api_router.include_router(billing_router)
 app.include_router(api_router)
 
 app.add_middleware(
@@ -61,6 +322,7 @@ app.add_middleware(
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
 # Configure logging
@@ -68,8 +330,4 @@ logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
-logger = logging.getLogger(__name__)
-
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
+logger = logging.getLogger(__name__)
\ No newline at end of file
@@ -0,0 +1,176 @@
+import logging
+from datetime import datetime, timedelta
+from typing import Optional
+from pymongo import ASCENDING, UpdateOne
+from mongo_indexes import ensure_ttl_index
+
+logger = logging.getLogger(__name__)
+
+EPOCH = datetime(1970, 1, 1)
+
+# Histogram bucket sizes in seconds
+HISTOGRAM_INTERVALS = {"minute": 60, "hour": 3600}
+HISTOGRAM_MAX_BUCKETS = 10000
+
+CLIENT_ROLLUP_COLLECTION = "status_rollup_clients"
+ROLLUP_TTL_INDEX = "bucket_ttl"
+
+
+def bucket_start(timestamp: datetime, seconds: int) -> datetime:
+    """Truncate a naive UTC timestamp to the start of its bucket"""
+    elapsed = int((timestamp - EPOCH).total_seconds())
+    return EPOCH + timedelta(seconds=elapsed - elapsed % seconds)
+
+
+def _bucket_expression(seconds: int) -> dict:
+    millis = {"$toLong": "$timestamp"}
+    return {"$toDate": {"$subtract": [millis, {"$mod": [millis, seconds * 1000]}]}}
+
+
+def _time_range_match(since: datetime, until: datetime, client_name: Optional[str], field: str) -> dict:
+    match = {field: {"$gte": since, "$lt": until}}
+    if client_name:
+        match["client_name"] = client_name
+    return match
+
+
+def client_stats_pipeline() -> list:
+    """Checks and last-seen timestamp per client_name"""
+    return [
+        {"$group": {"_id": "$client_name", "count": {"$sum": 1}, "last_seen": {"$max": "$timestamp"}}},
+        {"$project": {"_id": 0, "client_name": "$_id", "count": 1, "last_seen": 1}},
+        {"$sort": {"client_name": 1}},
+    ]
+
+
+def histogram_pipeline(interval: str, since: datetime, until: datetime, client_name: Optional[str] = None) -> list:
+    """Checks per time bucket over [since, until)"""
+    return [
+        {"$match": _time_range_match(since, until, client_name, "timestamp")},
+        {"$group": {"_id": _bucket_expression(HISTOGRAM_INTERVALS[interval]), "count": {"$sum": 1}}},
+        {"$project": {"_id": 0, "bucket": "$_id", "count": 1}},
+        {"$sort": {"bucket": 1}},
+    ]
+
+
+class StatusRollups:
+    """
+    Precomputed status_checks aggregates, updated incrementally on insert.
+    Client totals live in status_rollup_clients and per-(bucket, client_name)
+    counts in status_rollup_<interval>, so reads scale with the number of
+    clients and buckets rather than with history size.
+
+    With a retention period, status_checks expire through their TTL index and
+    the rollups follow: each bucket expires once every check it counts has,
+    and client totals are summed from the hour buckets instead of the lifetime
+    totals. Both then describe the retained checks, to within one hour bucket.
+    """
+    def __init__(self, db, retention_seconds: Optional[int] = None):
+        self.db = db
+        self.retention_seconds = retention_seconds
+        self.clients = db[CLIENT_ROLLUP_COLLECTION]
+        self.buckets = {
+            interval: db[f"status_rollup_{interval}"] for interval in HISTOGRAM_INTERVALS
+        }
+
+    async def initialize(self) -> None:
+        """
+        Create the indexes, building the rollups from status_checks the first
+        time they are enabled. Call before any checks are applied.
+        """
+        if await self.clients.estimated_document_count() == 0:
+            logger.info("Building status rollups from existing status_checks")
+            await self.rebuild()
+        else:
+            await self.ensure_indexes()
+
+    async def ensure_indexes(self) -> None:
+        for interval, collection in self.buckets.items():
+            await collection.create_index(
+                [("bucket", ASCENDING), ("client_name", ASCENDING)],
+                name="bucket_client_name",
+                unique=True,
+            )
+            expire_after = self.retention_seconds + HISTOGRAM_INTERVALS[interval] if self.retention_seconds else None
+            await ensure_ttl_index(collection, "bucket", ROLLUP_TTL_INDEX, expire_after)
+
+    async def apply(self, documents: list) -> None:
+        """Fold a batch of newly written status checks into the rollups"""
+        if not documents:
+            return
+
+        clients = {}
+        buckets = {interval: {} for interval in HISTOGRAM_INTERVALS}
+        for document in documents:
+            client_name, timestamp = document["client_name"], document["timestamp"]
+            count, last_seen = clients.get(client_name, (0, timestamp))
+            clients[client_name] = (count + 1, max(last_seen, timestamp))
+            for interval, seconds in HISTOGRAM_INTERVALS.items():
+                key = (bucket_start(timestamp, seconds), client_name)
+                count, last_seen = buckets[interval].get(key, (0, timestamp))
+                buckets[interval][key] = (count + 1, max(last_seen, timestamp))
+
+        await self.clients.bulk_write([
+            UpdateOne(
+                {"_id": client_name},
+                {"$inc": {"count": count}, "$max": {"last_seen": last_seen}},
+                upsert=True,
+            )
+            for client_name, (count, last_seen) in clients.items()
+        ], ordered=False)
+
+        for interval, counts in buckets.items():
+            await self.buckets[interval].bulk_write([
+                UpdateOne(
+                    {"bucket": bucket, "client_name": client_name},
+                    {"$inc": {"count": count}, "$max": {"last_seen": last_seen}},
+                    upsert=True,
+                )
+                for (bucket, client_name), (count, last_seen) in counts.items()
+            ], ordered=False)
+
+    async def rebuild(self) -> None:
+        """
+        Recompute all rollups from status_checks.
+        Checks written while the rebuild runs may be counted twice or missed.
+        """
+        await self.db.status_checks.aggregate([
+            {"$group": {"_id": "$client_name", "count": {"$sum": 1}, "last_seen": {"$max": "$timestamp"}}},
+            {"$out": CLIENT_ROLLUP_COLLECTION},
+        ]).to_list(None)
+
+        for interval, seconds in HISTOGRAM_INTERVALS.items():
+            await self.db.status_checks.aggregate([
+                {"$group": {
+                    "_id": {"bucket": _bucket_expression(seconds), "client_name": "$client_name"},
+                    "count": {"$sum": 1},
+                    "last_seen": {"$max": "$timestamp"},
+                }},
+                {"$project": {"_id": 0, "bucket": "$_id.bucket", "client_name": "$_id.client_name", "count": 1, "last_seen": 1}},
+                {"$out": self.buckets[interval].name},
+            ]).to_list(None)
+
+        await self.ensure_indexes()
+
+    async def client_stats(self) -> list:
+        if self.retention_seconds:
+            return await self.buckets["hour"].aggregate([
+                {"$group": {"_id": "$client_name", "count": {"$sum": "$count"}, "last_seen": {"$max": "$last_seen"}}},
+                {"$project": {"_id": 0, "client_name": "$_id", "count": 1, "last_seen": 1}},
+                {"$sort": {"client_name": 1}},
+            ]).to_list(None)
+
+        cursor = self.clients.find({}, sort=[("_id", ASCENDING)])
+        return [
+            {"client_name": row["_id"], "count": row["count"], "last_seen": row["last_seen"]}
+            async for row in cursor
+        ]
+
+    async def histogram(self, interval: str, since: datetime, until: datetime, client_name: Optional[str] = None) -> list:
+        """Checks per bucket over [since, until); since should be bucket-aligned"""
+        return await self.buckets[interval].aggregate([
+            {"$match": _time_range_match(since, until, client_name, "bucket")},
+            {"$group": {"_id": "$bucket", "count": {"$sum": "$count"}}},
+            {"$project": {"_id": 0, "bucket": "$_id", "count": 1}},
+            {"$sort": {"bucket": 1}},
+        ]).to_list(None)
@@ -1,10 +1,16 @@
 import os
-from supabase import create_client, Client
+import asyncio
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from supabase import create_client, Client, ClientOptions
 from typing import Optional
 from fastapi import HTTPException, status
 import jwt
 from datetime import datetime
 import logging
+from cache import TTLCache
+from http_pool import create_http_client, create_http_transport
 
 logger = logging.getLogger(__name__)
 
@@ -18,16 +24,45 @@ class SupabaseClient:
         if not all([self.url, self.anon_key, self.service_role_key, self.jwt_secret]):
             raise ValueError("Missing required Supabase environment variables")
         
+        # Keep-alive connection pool shared by both clients. Each client gets
+        # its own httpx.Client so their auth headers never mix.
+        self.http_transport = create_http_transport()
+        self._http_clients = [create_http_client(self.http_transport) for _ in range(2)]
+        
         # Client for public operations (using anon key)
-        self.public_client: Client = create_client(self.url, self.anon_key)
+        self.public_client: Client = create_client(
+            self.url, self.anon_key, options=ClientOptions(httpx_client=self._http_clients[0])
+        )
         
         # Client for admin operations (using service role key)
-        self.admin_client: Client = create_client(self.url, self.service_role_key)
+        self.admin_client: Client = create_client(
+            self.url, self.service_role_key, options=ClientOptions(httpx_client=self._http_clients[1])
+        )
         
         logger.info("Supabase clients initialized successfully")
+        
+        # Cache of verified claims keyed by token digest
+        self.token_cache = TTLCache(
+            max_size=int(os.getenv("SUPABASE_JWT_CACHE_SIZE", "10000")),
+            ttl=float(os.getenv("SUPABASE_JWT_CACHE_TTL", "300")),
+        )
+        
+        # Bounded pool for running blocking PostgREST calls off the event loop
+        self.max_concurrency = int(os.getenv("SUPABASE_MAX_CONCURRENCY", "16"))
+        self.request_timeout = float(os.getenv("SUPABASE_REQUEST_TIMEOUT", "10"))
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_concurrency,
+            thread_name_prefix="supabase",
+        )
+        self._slots = asyncio.Semaphore(self.max_concurrency)
     
     def verify_jwt(self, token: str) -> dict:
         """Verify and decode JWT token locally for better performance"""
+        cache_key = hashlib.sha256(token.encode()).digest()
+        cached = self.token_cache.get(cache_key)
+        if cached is not None:
+            return dict(cached)
+        
         try:
             payload = jwt.decode(
                 token,
@@ -44,7 +79,8 @@ class SupabaseClient:
                     detail="Token has expired"
                 )
             
-            return payload
+            self.token_cache.set(cache_key, payload, expires_at=exp)
+            return dict(payload)
             
         except jwt.ExpiredSignatureError:
             raise HTTPException(
@@ -72,19 +108,105 @@ class SupabaseClient:
             "exp": payload.get("exp")
         }
     
+    async def execute(self, query, timeout: Optional[float] = None):
+        """
+        Execute a query builder (table/rpc) in the bounded thread pool.
+        Calls wait for one of max_concurrency slots before they are submitted,
+        so the pool never queues work. The timeout starts once a slot is held;
+        on expiry HTTPException 504 is raised, while the call itself keeps its
+        slot until the httpx read timeout ends it.
+        """
+        await self._slots.acquire()
+        loop = asyncio.get_running_loop()
+        try:
+            future = self._executor.submit(query.execute)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._release_slot(loop))
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout or self.request_timeout)
+        except asyncio.TimeoutError:
+            raise HTTPException(
+                status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                detail="Supabase request timed out"
+            )
+    
+    def _release_slot(self, loop: asyncio.AbstractEventLoop):
+        # Runs in the worker thread when the call ends, which may be after a timeout
+        if not loop.is_closed():
+            loop.call_soon_threadsafe(self._slots.release)
+    
+    def pool_stats(self) -> dict:
+        """Return HTTP connection pool statistics (in-use, idle, wait time)"""
+        return self.http_transport.stats()
+    
+    def close(self):
+        """Release the worker threads and pooled connections"""
+        self._executor.shutdown(wait=False)
+        for http_client in self._http_clients:
+            http_client.close()
+    
     async def test_connection(self) -> bool:
         """Test connection to Supabase"""
         try: 
             # Simple query to test connection
-            result = self.admin_client.table('profiles').select('id').limit(1).execute()
+            result = await self.execute(self.admin_client.table('profiles').select('id').limit(1))
             logger.info("Supabase connection test successful")
             return True
         except Exception as e:
             logger.error(f"Supabase connection test failed: {e}")
             return False
 
+# Per-process instance, created on first use
+_instance: Optional[SupabaseClient] = None
+_instance_lock = threading.Lock()
+
+def get_supabase_client() -> SupabaseClient:
+    """Return this process's SupabaseClient, creating it on first use"""
+    global _instance
+    if _instance is None:
+        with _instance_lock:
+            if _instance is None:
+                _instance = SupabaseClient()
+    return _instance
+
+def _reset_after_fork():
+    # Forked workers must not reuse the parent's sockets or worker threads
+    global _instance, _instance_lock
+    _instance = None
+    _instance_lock = threading.Lock()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+async def warm_up_supabase_client() -> bool:
+    """
+    Create the client and open a pooled connection ahead of the first request.
+    Call from app startup; logs instead of raising if Supabase is not configured.
+    """
+    try:
+        client = get_supabase_client()
+    except ValueError as e:
+        logger.warning(f"Skipping Supabase warm-up: {e}")
+        return False
+    return await client.test_connection()
+
+def close_supabase_client():
+    """Close this process's client if it was created"""
+    global _instance
+    with _instance_lock:
+        if _instance is not None:
+            _instance.close()
+            _instance = None
+
+class _LazySupabaseClient:
+    """Module-level handle that defers to get_supabase_client() on attribute access"""
+    def __getattr__(self, name):
+        return getattr(get_supabase_client(), name)
+
 # Global instance
-supabase_client = SupabaseClient()
+supabase_client = _LazySupabaseClient()
 
 # Constants for table names
 class Tables:
@@ -96,6 +218,11 @@ class Tables:
     TOOLS = 'tools'
     USER_TRACKS = 'user_tracks'
     USER_TOOLS = 'user_tools'
+    FAQ_CATEGORIES = 'faq_categories'
+    FAQ_ITEMS = 'faq_items'
+    SUBSCRIPTIONS = 'subscriptions'
+    SUBSCRIPTION_PLANS = 'subscription_plans'
+    BILLING_HISTORY = 'billing_history'
 
 # Constants for storage buckets  
 class Buckets:
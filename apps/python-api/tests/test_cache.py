@@ -0,0 +1,75 @@
+from types import SimpleNamespace
+import pytest
+import cache
+from cache import TTLCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = SimpleNamespace(value=1000.0)
+    monkeypatch.setattr(cache, "time", SimpleNamespace(time=lambda: now.value))
+    return now
+
+
+def test_entries_expire_after_ttl(clock):
+    entries = TTLCache(max_size=10, ttl=5)
+    entries.set("a", 1)
+
+    clock.value += 4.9
+    assert entries.get("a") == 1
+    clock.value += 0.1
+    assert entries.get("a") is None
+    assert len(entries) == 0
+
+
+def test_entry_expiry_is_capped_by_ttl(clock):
+    entries = TTLCache(max_size=10, ttl=5)
+    entries.set("short", 1, expires_at=clock.value + 1)
+    entries.set("long", 2, expires_at=clock.value + 3600)
+
+    clock.value += 2
+    assert entries.get("short") is None
+    assert entries.get("long") == 2
+    clock.value += 3
+    assert entries.get("long") is None
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    entries = TTLCache(max_size=2, ttl=60)
+    entries.set("a", 1)
+    entries.set("b", 2)
+    entries.get("a")
+    entries.set("c", 3)
+
+    assert entries.get("b") is None
+    assert entries.get("a") == 1
+    assert entries.get("c") == 3
+    assert entries.stats()["evictions"] == 1
+
+
+def test_default_is_returned_for_missing_and_cached_none_is_kept(clock):
+    entries = TTLCache(max_size=10, ttl=60)
+    missing = object()
+    entries.set("none", None)
+
+    assert entries.get("none", missing) is None
+    assert entries.get("other", missing) is missing
+
+
+def test_invalidate_clear_and_stats(clock):
+    entries = TTLCache(max_size=10, ttl=60)
+    entries.set("a", 1)
+    entries.set("b", 2)
+    entries.invalidate("a")
+
+    assert entries.get("a") is None
+    assert entries.get("b") == 2
+    assert entries.stats() == {"size": 1, "max_size": 10, "hits": 1, "misses": 1, "evictions": 0}
+    entries.clear()
+    assert len(entries) == 0
+
+
+def test_zero_size_cache_stores_nothing(clock):
+    entries = TTLCache(max_size=0, ttl=60)
+    entries.set("a", 1)
+    assert entries.get("a") is None
@@ -0,0 +1,78 @@
+import asyncio
+import pytest
+from dataloader import DataLoader
+
+
+class Source:
+    """batch_load recording the batches it receives"""
+    def __init__(self, values: dict, error: Exception = None):
+        self.values = values
+        self.error = error
+        self.batches = []
+
+    async def __call__(self, keys: list) -> dict:
+        self.batches.append(keys)
+        if self.error is not None:
+            raise self.error
+        return {key: self.values[key] for key in keys if key in self.values}
+
+
+def test_loads_in_the_same_tick_are_batched_and_deduped():
+    source = Source({"a": 1, "b": 2, "c": 3})
+
+    async def main():
+        loader = DataLoader(source)
+        return await asyncio.gather(loader.load("a"), loader.load("b"), loader.load("a"), loader.load_many(["c", "b"]))
+
+    assert asyncio.run(main()) == [1, 2, 1, [3, 2]]
+    assert source.batches == [["a", "b", "c"]]
+
+
+def test_loaded_keys_are_not_fetched_again():
+    source = Source({"a": 1, "b": 2})
+
+    async def main():
+        loader = DataLoader(source)
+        first = await loader.load("a")
+        second = await loader.load_many(["a", "b"])
+        return first, second
+
+    assert asyncio.run(main()) == (1, [1, 2])
+    assert source.batches == [["a"], ["b"]]
+
+
+def test_missing_keys_resolve_to_none():
+    source = Source({"a": 1})
+
+    async def main():
+        return await DataLoader(source).load_many(["a", "missing"])
+
+    assert asyncio.run(main()) == [1, None]
+
+
+def test_batches_are_split_by_max_batch_size():
+    source = Source({key: key for key in range(5)})
+
+    async def main():
+        loader = DataLoader(source, max_batch_size=2)
+        values = await loader.load_many(range(5))
+        return values, loader._tasks
+
+    values, tasks = asyncio.run(main())
+    assert values == [0, 1, 2, 3, 4]
+    assert source.batches == [[0, 1], [2, 3], [4]]
+    assert not tasks
+
+
+def test_errors_reach_every_key_and_failed_keys_are_retried():
+    source = Source({"a": 1}, error=RuntimeError("down"))
+
+    async def main():
+        loader = DataLoader(source)
+        with pytest.raises(RuntimeError):
+            await loader.load_many(["a", "b"])
+        source.error = None
+        return await loader.load("a")
+
+    assert asyncio.run(main()) == 1
+    assert source.batches == [["a", "b"], ["a"]]
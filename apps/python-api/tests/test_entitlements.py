@@ -0,0 +1,80 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+import pytest
+from fastapi import HTTPException
+import auth_middleware
+from auth_middleware import _resolve_entitlements
+
+PLAN = {"name": "Pro", "features": {"ai_chat": True}, "credits_limit": 100}
+
+
+def subscription(status: str, trial_end: timedelta = None, period_end: timedelta = None) -> dict:
+    """Subscription row whose trial and period end the given offsets from now"""
+    now = datetime.now(timezone.utc)
+    return {
+        "status": status,
+        "plan_id": "pro",
+        "trial_end": (now + trial_end).isoformat() if trial_end is not None else None,
+        "current_period_end": (now + period_end).isoformat() if period_end is not None else None,
+        "subscription_plans": PLAN,
+    }
+
+
+def test_no_subscription_has_no_entitlements():
+    entitlements, expires_at = _resolve_entitlements(None)
+    assert entitlements["active"] is False
+    assert (entitlements["features"], entitlements["credits_limit"], entitlements["plan_id"]) == ({}, 0, None)
+    assert expires_at is None
+
+
+def test_active_subscription_is_cached_until_the_period_ends():
+    row = subscription("active", period_end=timedelta(days=3))
+    entitlements, expires_at = _resolve_entitlements(row)
+
+    assert entitlements["active"] is True
+    assert (entitlements["plan"], entitlements["features"], entitlements["credits_limit"]) == ("Pro", {"ai_chat": True}, 100)
+    assert expires_at == datetime.fromisoformat(row["current_period_end"]).timestamp()
+
+
+def test_running_trial_is_entitled_until_the_trial_ends():
+    row = subscription("trialing", trial_end=timedelta(hours=1), period_end=timedelta(days=30))
+    entitlements, expires_at = _resolve_entitlements(row)
+
+    assert entitlements["active"] is True
+    assert entitlements["expires_at"] == row["trial_end"]
+    assert expires_at == datetime.fromisoformat(row["trial_end"]).timestamp()
+
+
+def test_ended_trial_loses_features():
+    entitlements, expires_at = _resolve_entitlements(subscription("trialing", trial_end=timedelta(seconds=-1)))
+    assert entitlements["active"] is False
+    assert (entitlements["features"], entitlements["credits_limit"]) == ({}, 0)
+    assert expires_at is None
+
+
+def test_past_period_end_does_not_set_an_expiry_in_the_past():
+    entitlements, expires_at = _resolve_entitlements(subscription("active", period_end=timedelta(minutes=-5)))
+    assert entitlements["active"] is True
+    assert expires_at is None
+
+
+def test_features_are_copied_from_the_plan():
+    entitlements, _ = _resolve_entitlements(subscription("active"))
+    entitlements["features"]["ai_chat"] = False
+    assert PLAN["features"] == {"ai_chat": True}
+
+
+def test_lookup_failure_is_logged_and_reported_as_unavailable(monkeypatch, caplog):
+    async def execute(query):
+        raise ConnectionError("down")
+
+    monkeypatch.setattr(auth_middleware, "supabase_client", SimpleNamespace(admin_client=MagicMock(), execute=execute))
+    auth_middleware.invalidate_entitlements()
+    with caplog.at_level(logging.ERROR, logger="auth_middleware"), pytest.raises(HTTPException) as error:
+        asyncio.run(auth_middleware.get_user_entitlements("user"))
+
+    assert error.value.status_code == 503
+    assert "user" in caplog.text and "down" in caplog.text
@@ -0,0 +1,60 @@
+import gzip
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+import help_center
+from auth_middleware import get_current_user
+from help_center import HelpCenterSnapshot, build_help_center
+
+
+def test_categories_and_items_are_ordered_and_featured_items_collected():
+    categories = [
+        {"id": 2, "slug": "billing", "sort_order": 1},
+        {"id": 1, "slug": "account", "sort_order": 1},
+        {"id": 3, "slug": "tools", "sort_order": 0},
+    ]
+    items = [
+        {"id": "b", "category_id": 1, "sort_order": 2, "created_at": "2024-01-01"},
+        {"id": "a", "category_id": 1, "sort_order": 1, "created_at": "2024-01-02", "is_featured": True},
+        {"id": "c", "category_id": 1, "sort_order": 2, "created_at": "2024-01-03"},
+        {"id": "t", "category_id": 3, "sort_order": None, "is_featured": True},
+        {"id": "orphan", "category_id": 9, "is_featured": True},
+    ]
+    model = build_help_center(categories, items)
+
+    assert [category["slug"] for category in model["categories"]] == ["tools", "account", "billing"]
+    assert [item["id"] for item in model["categories"][1]["items"]] == ["a", "b", "c"]
+    assert model["categories"][2]["items"] == []
+    assert [(item["id"], item["category_slug"]) for item in model["featured"]] == [("t", "tools"), ("a", "account")]
+
+
+@pytest.fixture
+def client(monkeypatch):
+    snapshot = HelpCenterSnapshot({"categories": [], "featured": []}, "1:2024-01-01|0:")
+    monkeypatch.setattr(help_center.help_center, "snapshot", snapshot)
+    app = FastAPI()
+    app.include_router(help_center.router)
+    app.dependency_overrides[get_current_user] = lambda: {"id": "user"}
+    return TestClient(app), snapshot
+
+
+def test_each_encoding_has_its_own_etag(client):
+    client, snapshot = client
+    plain = client.get("/help", headers={"Accept-Encoding": "identity"})
+    compressed = client.get("/help", headers={"Accept-Encoding": "gzip"})
+
+    assert plain.content == snapshot.payload
+    assert compressed.content == snapshot.payload
+    assert plain.headers["ETag"] != compressed.headers["ETag"]
+    assert plain.headers["Vary"] == compressed.headers["Vary"] == "Accept-Encoding"
+    assert gzip.decompress(snapshot.compressed) == snapshot.payload
+
+
+def test_not_modified_only_for_the_etag_of_the_requested_encoding(client):
+    client, snapshot = client
+    gzip_request = {"Accept-Encoding": "gzip"}
+
+    assert client.get("/help", headers={**gzip_request, "If-None-Match": snapshot.gzip_etag}).status_code == 304
+    assert client.get("/help", headers={**gzip_request, "If-None-Match": snapshot.etag}).status_code == 200
+    assert client.get("/help", headers={"Accept-Encoding": "identity", "If-None-Match": f"W/{snapshot.etag}"}).status_code == 304
+    assert client.get("/help", headers={"Accept-Encoding": "identity", "If-None-Match": snapshot.gzip_etag}).status_code == 200
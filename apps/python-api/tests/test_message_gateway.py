@@ -0,0 +1,110 @@
+import time
+from types import SimpleNamespace
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+import conversations
+import message_gateway
+from message_gateway import InMemoryBroker, SupabaseChangeFeed
+
+
+def messages(subscription) -> list:
+    received = []
+    while not subscription.queue.empty():
+        received.append(subscription.queue.get_nowait()["id"])
+    return received
+
+
+def test_publish_reaches_only_subscribers_of_the_conversation():
+    broker = InMemoryBroker()
+    alice = broker.subscribe("alice", ["c1", "c2"])
+    alice_phone = broker.subscribe("alice", ["c1"])
+    bob = broker.subscribe("bob", ["c2"])
+
+    assert broker.publish({"id": "m1", "conversation_id": "c1"}) == 2
+    assert broker.publish({"id": "m2", "conversation_id": "c2"}) == 2
+    assert broker.publish({"id": "m3", "conversation_id": "c3"}) == 0
+    assert (messages(alice), messages(alice_phone), messages(bob)) == (["m1", "m2"], ["m1"], ["m2"])
+    assert broker.stats()["connections"] == 3
+
+
+def test_unsubscribe_removes_the_connection_from_every_index():
+    broker = InMemoryBroker()
+    alice = broker.subscribe("alice", ["c1", "c2"])
+    bob = broker.subscribe("bob", ["c1"])
+    broker.unsubscribe(alice)
+
+    assert broker.publish({"id": "m1", "conversation_id": "c1"}) == 1
+    assert messages(bob) == ["m1"]
+    assert broker.stats()["users"] == 1
+    assert broker.stats()["conversations"] == 1
+
+
+def test_join_and_leave_update_open_subscriptions():
+    broker = InMemoryBroker()
+    alice = broker.subscribe("alice", ["c1"])
+
+    broker.join("alice", "c2")
+    broker.publish({"id": "m1", "conversation_id": "c2"})
+    broker.leave("alice", "c1")
+    broker.publish({"id": "m2", "conversation_id": "c1"})
+
+    assert messages(alice) == ["m1"]
+    assert alice.conversation_ids == {"c2"}
+    assert broker.stats()["conversations"] == 1
+
+
+def test_full_queue_marks_the_subscriber_lagged():
+    broker = InMemoryBroker(queue_size=1)
+    alice = broker.subscribe("alice", ["c1"])
+    broker.publish({"id": "m1", "conversation_id": "c1"})
+    broker.publish({"id": "m2", "conversation_id": "c1"})
+
+    assert alice.lagged
+    assert messages(alice) == ["m1"]
+    assert broker.stats()["dropped"] == 1
+
+
+def test_participant_delete_unsubscribes_and_drops_cached_details():
+    broker = InMemoryBroker()
+    alice = broker.subscribe("alice", ["c1"])
+    conversations.conversation_details_cache.set("c1", {"id": "c1", "participants": [{"user_id": "alice"}]})
+    feed = SupabaseChangeFeed(broker)
+
+    feed._on_participant_removed({"data": {"old_record": {"conversation_id": "c1", "user_id": "alice"}}})
+
+    assert broker.publish({"id": "m1", "conversation_id": "c1"}) == 0
+    assert alice.conversation_ids == set()
+    assert conversations.conversation_details_cache.get("c1") is None
+
+
+@pytest.fixture
+def gateway(monkeypatch):
+    """Gateway app whose tokens are "<user id>:<exp>" and whose users have no conversations"""
+    def verify_jwt(token):
+        user_id, exp = token.split(":")
+        return {"sub": user_id, "exp": float(exp)}
+
+    async def no_conversations(user_id):
+        return []
+
+    monkeypatch.setattr(message_gateway, "supabase_client", SimpleNamespace(verify_jwt=verify_jwt))
+    monkeypatch.setattr(message_gateway, "_user_conversation_ids", no_conversations)
+    monkeypatch.setattr(message_gateway, "broker", InMemoryBroker())
+    app = FastAPI()
+    app.include_router(message_gateway.router)
+    return TestClient(app)
+
+
+def test_websocket_is_closed_when_the_token_expires(gateway):
+    with gateway.websocket_connect(f"/realtime/ws?token=alice:{time.time() + 0.2}") as socket:
+        with pytest.raises(WebSocketDisconnect) as closed:
+            socket.receive_bytes()
+    assert closed.value.code == 1008
+    assert message_gateway.broker.stats()["connections"] == 0
+
+
+def test_event_stream_ends_when_the_token_expires(gateway):
+    response = gateway.get("/realtime/sse", headers={"Authorization": f"Bearer alice:{time.time() + 0.2}"})
+    assert response.text.endswith("event: expired\ndata: {}\n\n")
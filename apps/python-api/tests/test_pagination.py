@@ -0,0 +1,113 @@
+import asyncio
+import importlib
+from datetime import date, datetime, timedelta
+import pytest
+from fastapi import HTTPException
+from mongomock_motor import AsyncMongoMockClient
+from pagination import decode_cursor, decode_keyset_cursor, encode_cursor, keyset_cursor, keyset_page
+
+ROW_ID = "6f1c2a9e-8b3d-4e5f-9a7b-1c2d3e4f5a6b"
+
+
+class Query:
+    """PostgREST query builder recording the filters and ordering applied"""
+    def __init__(self):
+        self.calls = []
+
+    def or_(self, filters):
+        self.calls.append(("or", filters))
+        return self
+
+    def order(self, column, desc=False):
+        self.calls.append(("order", column, desc))
+        return self
+
+
+def test_cursor_round_trips_without_padding():
+    cursor = encode_cursor({"timestamp": datetime(2024, 5, 1, 10, 30), "id": "a"})
+    assert "=" not in cursor
+    assert decode_cursor(cursor, "timestamp", "id") == {"timestamp": "2024-05-01 10:30:00", "id": "a"}
+
+
+@pytest.mark.parametrize("cursor", ["not base64!", "bm90IGpzb24", encode_cursor([1, 2]), encode_cursor({"id": "a"})])
+def test_malformed_or_incomplete_cursors_are_rejected(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor, "timestamp", "id")
+    assert error.value.status_code == 400
+
+
+def test_keyset_cursor_is_decoded_to_canonical_values():
+    cursor = keyset_cursor({"billing_date": "2024-05-01", "id": ROW_ID.upper(), "amount": 10}, "billing_date")
+    assert decode_keyset_cursor(cursor, "billing_date", date.fromisoformat) == ("2024-05-01", ROW_ID)
+
+
+@pytest.mark.parametrize("position", [
+    {"billing_date": "2024-13-01", "id": ROW_ID},
+    {"billing_date": 20240501, "id": ROW_ID},
+    {"billing_date": "2024-05-01", "id": "1) or (true"},
+    {"billing_date": "2024-05-01", "id": None},
+])
+def test_keyset_cursor_values_must_parse(position):
+    with pytest.raises(HTTPException) as error:
+        decode_keyset_cursor(encode_cursor(position), "billing_date", date.fromisoformat)
+    assert error.value.status_code == 400
+
+
+def test_keyset_page_filters_after_the_position_in_the_requested_direction():
+    position = ("2024-05-01T10:00:00+00:00", ROW_ID)
+
+    newer = keyset_page(Query(), "created_at", position, ascending=True).calls
+    older = keyset_page(Query(), "created_at", position, ascending=False).calls
+
+    assert newer == [
+        ("or", f'created_at.gt."2024-05-01T10:00:00+00:00",and(created_at.eq."2024-05-01T10:00:00+00:00",id.gt.{ROW_ID})'),
+        ("order", "created_at", False),
+        ("order", "id", False),
+    ]
+    assert older[0] == ("or", f'created_at.lt."2024-05-01T10:00:00+00:00",and(created_at.eq."2024-05-01T10:00:00+00:00",id.lt.{ROW_ID})')
+    assert older[1:] == [("order", "created_at", True), ("order", "id", True)]
+
+
+def test_first_keyset_page_is_only_ordered():
+    assert keyset_page(Query(), "created_at", None, ascending=False).calls == [
+        ("order", "created_at", True),
+        ("order", "id", True),
+    ]
+
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setenv("MONGO_URL", "mongodb://localhost:27017")
+    return importlib.import_module("server")
+
+
+def test_status_pages_cover_every_check_once_across_equal_timestamps(server):
+    start = datetime(2024, 5, 1, 10)
+    checks = [
+        {"id": f"{n:02d}", "client_name": "web", "timestamp": start + timedelta(seconds=n // 3)}
+        for n in range(10)
+    ]
+
+    async def main():
+        collection = AsyncMongoMockClient()["test"]["status_checks"]
+        await collection.insert_many([dict(check) for check in checks])
+        pages, cursor = [], None
+        while True:
+            page = await collection.find(
+                server._status_keyset_filter(cursor), {"_id": 0}, sort=[("timestamp", -1), ("id", -1)]
+            ).limit(4).to_list(None)
+            if not page:
+                return pages
+            pages.append([check["id"] for check in page])
+            cursor = server._status_cursor(page[-1])
+
+    pages = asyncio.run(main())
+    assert [check_id for page in pages for check_id in page] == [f"{n:02d}" for n in reversed(range(10))]
+    assert len(pages) == 3
+
+
+def test_status_cursor_with_an_invalid_timestamp_is_rejected(server):
+    with pytest.raises(HTTPException) as error:
+        server._status_keyset_filter(encode_cursor({"timestamp": "yesterday", "id": "a"}))
+    assert error.value.status_code == 400
+    assert server._status_keyset_filter(None) == {}
@@ -0,0 +1,131 @@
+import asyncio
+import httpx
+import pytest
+from fastapi import HTTPException
+from postgrest.exceptions import APIError
+from periodic_flusher import PeriodicFlusher, write_not_applied
+
+
+class SumFlusher(PeriodicFlusher):
+    """Sums values per key; _write fails with the queued errors first and takes delay seconds"""
+    def __init__(self, errors=(), idempotent=False, delay=0, **options):
+        options = {"flush_interval": 60, "max_pending": 100, "batch_size": 100, **options}
+        super().__init__("test", idempotent=idempotent, **options)
+        self.errors = list(errors)
+        self.delay = delay
+        self.batches = []
+
+    def _combine(self, current, value):
+        return current + value
+
+    async def _write(self, batch):
+        await asyncio.sleep(self.delay)
+        if self.errors:
+            raise self.errors.pop(0)
+        self.batches.append(dict(batch))
+
+
+def test_write_not_applied():
+    assert write_not_applied(httpx.ConnectError("refused"))
+    assert write_not_applied(httpx.PoolTimeout("busy"))
+    assert write_not_applied(APIError({"message": "deadlock detected", "code": "40P01"}))
+    # The write may have committed before the response was lost
+    assert not write_not_applied(HTTPException(status_code=504, detail="Supabase request timed out"))
+    assert not write_not_applied(httpx.ReadTimeout("slow"))
+    assert not write_not_applied(APIError({"message": "JSON could not be generated", "code": 502}))
+
+
+def test_batch_that_was_not_applied_is_merged_back():
+    async def main():
+        flusher = SumFlusher(errors=[APIError({"message": "deadlock detected", "code": "40P01"})])
+        flusher._merge("a", 2)
+        await flusher.flush()
+        flusher._merge("a", 1)
+        await flusher.flush()
+        return flusher
+
+    flusher = asyncio.run(main())
+    assert flusher.batches == [{"a": 3}]
+    assert flusher.stats()["requeued"] == 1
+
+
+def test_batch_that_may_have_been_applied_is_discarded():
+    async def main():
+        flusher = SumFlusher(errors=[HTTPException(status_code=504, detail="timeout")])
+        flusher._merge("a", 2)
+        await flusher.flush()
+        flusher._merge("a", 1)
+        await flusher.flush()
+        return flusher
+
+    flusher = asyncio.run(main())
+    assert flusher.batches == [{"a": 1}]
+    assert flusher.stats()["discarded"] == 1
+
+
+def test_idempotent_batches_are_always_retried():
+    async def main():
+        flusher = SumFlusher(errors=[HTTPException(status_code=504, detail="timeout")], idempotent=True)
+        flusher._merge("a", 2)
+        await flusher.flush()
+        await flusher.flush()
+        return flusher
+
+    assert asyncio.run(main()).batches == [{"a": 2}]
+
+
+def test_flush_writes_in_batches_and_respects_max_pending():
+    async def main():
+        flusher = SumFlusher(batch_size=2, max_pending=3)
+        accepted = [flusher._merge(key, 1) for key in "abcd"]
+        await flusher.close()
+        return accepted, flusher
+
+    accepted, flusher = asyncio.run(main())
+    assert accepted == [True, True, True, False]
+    assert flusher.batches == [{"a": 1, "b": 1}, {"c": 1}]
+    assert flusher.stats()["written"] == 3
+
+
+def test_subclass_missing_a_hook_cannot_be_created():
+    class Incomplete(PeriodicFlusher):
+        def _combine(self, current, value):
+            return value
+
+    with pytest.raises(TypeError):
+        Incomplete("test", 1, 10, 10)
+
+
+def test_close_during_a_slow_flush_writes_everything():
+    async def main():
+        flusher = SumFlusher(delay=0.05, flush_interval=0.01, batch_size=2)
+        flusher.start()
+        for key in "abcd":
+            flusher._merge(key, 1)
+        await asyncio.sleep(0.03)
+        assert flusher.flushes == 1 and not flusher._pending
+        flusher._merge("e", 1)
+        await flusher.close()
+        return flusher
+
+    flusher = asyncio.run(main())
+    assert flusher.batches == [{"a": 1, "b": 1}, {"c": 1, "d": 1}, {"e": 1}]
+    assert flusher.stats()["written"] == 5
+    assert flusher.stats()["pending"] == 0
+
+
+def test_cancelled_flush_keeps_the_batches_not_yet_sent():
+    async def main():
+        flusher = SumFlusher(delay=1, batch_size=2)
+        for key in "abcde":
+            flusher._merge(key, 1)
+        flush = asyncio.ensure_future(flusher.flush())
+        await asyncio.sleep(0.01)
+        flush.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await flush
+        return flusher
+
+    flusher = asyncio.run(main())
+    assert flusher._pending == {"c": 1, "d": 1, "e": 1}
+    assert flusher.stats()["discarded"] == 2
@@ -0,0 +1,60 @@
+import asyncio
+from types import SimpleNamespace
+import pytest
+import refresher
+from refresher import BackgroundRefresher, VersionedSnapshot
+
+
+class Snapshot(VersionedSnapshot):
+    """VersionedSnapshot recording the versions it loads"""
+    def __init__(self):
+        super().__init__("Test", ("a", "b"), refresh_interval=60)
+        self.loaded = []
+
+    async def _load(self, version: str):
+        self.loaded.append(version)
+        return SimpleNamespace(version=version)
+
+
+@pytest.fixture
+def versions(monkeypatch):
+    current = {"a": "1:x", "b": "0:"}
+
+    async def fetch_table_version(table):
+        return current[table]
+
+    monkeypatch.setattr(refresher, "fetch_table_version", fetch_table_version)
+    return current
+
+
+def test_snapshot_is_reloaded_only_when_a_table_version_changes(versions):
+    async def main():
+        snapshot = Snapshot()
+        first = await snapshot.get()
+        unchanged = await snapshot.refresh()
+        versions["b"] = "1:y"
+        changed = await snapshot.refresh()
+        forced = await snapshot.refresh(force=True)
+        return snapshot, first, (unchanged, changed, forced)
+
+    snapshot, first, reloaded = asyncio.run(main())
+    assert first.version == "1:x|0:"
+    assert reloaded == (False, True, True)
+    assert snapshot.loaded == ["1:x|0:", "1:x|1:y", "1:x|1:y"]
+    assert (snapshot.checks, snapshot.reloads) == (4, 3)
+
+
+def test_concurrent_first_reads_load_once(versions):
+    async def main():
+        snapshot = Snapshot()
+        await asyncio.gather(*(snapshot.get() for _ in range(5)))
+        return snapshot.loaded
+
+    assert asyncio.run(main()) == ["1:x|0:"]
+
+
+def test_hooks_must_be_implemented():
+    with pytest.raises(TypeError):
+        BackgroundRefresher("Test", 60)
+    with pytest.raises(TypeError):
+        VersionedSnapshot("Test", ("a",), 60)
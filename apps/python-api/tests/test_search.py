@@ -0,0 +1,75 @@
+from search import InvertedIndex, tokenize
+
+
+def build(documents: dict) -> InvertedIndex:
+    """Index of ("track", id) -> title/description documents"""
+    index = InvertedIndex()
+    for id_, (title, description) in documents.items():
+        index.add(("track", id_), {"title": (title, 3.0), "description": (description, 1.0)}, {"title": title})
+    return index
+
+
+def ids(results: list) -> list:
+    return [key[1] for _, key in results]
+
+
+def test_tokenize_folds_accents_and_drops_stopwords():
+    assert tokenize("Criação de Conteúdo para o Instagram") == ["criacao", "conteudo", "instagram"]
+    assert tokenize(None) == []
+
+
+def test_query_words_match_terms_they_prefix():
+    index = build({
+        "1": ("Marketing digital", ""),
+        "2": ("Mercado financeiro", ""),
+        "3": ("Roteiros para reels", ""),
+    })
+    assert ids(index.search("mark", 10)) == ["1"]
+    assert set(ids(index.search("m", 10))) == {"1", "2"}
+    assert index.search("xyz", 10) == []
+
+
+def test_exact_matches_rank_above_prefix_matches():
+    index = build({
+        "prefix": ("Marketing", ""),
+        "exact": ("Market", ""),
+    })
+    assert ids(index.search("market", 10)) == ["exact", "prefix"]
+
+
+def test_weighted_fields_and_rare_terms_rank_higher():
+    index = build({
+        "title": ("Copywriting", "Textos que vendem"),
+        "description": ("Textos", "Guia de copywriting"),
+        "other": ("Textos", "Roteiros"),
+    })
+    assert ids(index.search("copywriting", 10)) == ["title", "description"]
+    # "copywriting" is rarer than "textos", so it decides the order
+    assert ids(index.search("textos copywriting", 10))[:2] == ["title", "description"]
+
+
+def test_search_is_accent_insensitive_and_limited():
+    index = build({str(n): (f"Edição de vídeo {n}", "") for n in range(5)})
+    assert len(index.search("edicao", 3)) == 3
+    assert len(index.search("EDIÇÃO vid", 10)) == 5
+
+
+def test_documents_can_be_replaced_and_removed():
+    index = build({"1": ("Marketing", ""), "2": ("Vendas", "")})
+    index.add(("track", "1"), {"title": ("Branding", 3.0)}, {"title": "Branding"})
+    assert ids(index.search("mark", 10)) == []
+    assert ids(index.search("brand", 10)) == ["1"]
+    assert index.documents[("track", "1")] == {"title": "Branding"}
+
+    index.remove(("track", "1"))
+    index.remove(("track", "missing"))
+    assert len(index) == 1
+    assert "branding" not in index.vocabulary
+    assert "marketing" not in index.postings
+
+
+def test_kinds_filter_results():
+    index = InvertedIndex()
+    index.add(("track", "t"), {"title": ("Instagram", 1.0)}, {})
+    index.add(("faq", "f"), {"question": ("Instagram", 1.0)}, {})
+    assert [key for _, key in index.search("insta", 10, {"faq"})] == [("faq", "f")]
@@ -0,0 +1,84 @@
+import asyncio
+from datetime import datetime
+from mongomock_motor import AsyncMongoMockClient
+from status_stats import StatusRollups, bucket_start
+
+
+def check(client_name: str, minute: int, second: int = 0) -> dict:
+    return {"client_name": client_name, "timestamp": datetime(2024, 5, 1, 10, minute, second)}
+
+
+CHECKS = [check("web", 0), check("web", 0, 30), check("web", 59, 59), check("ios", 1)]
+
+
+def run(test, **options):
+    """Run test(rollups, db) over a mongomock database"""
+    async def main():
+        db = AsyncMongoMockClient()["test"]
+        return await test(StatusRollups(db, **options), db)
+    return asyncio.run(main())
+
+
+def test_bucket_start_truncates_to_the_interval():
+    assert bucket_start(datetime(2024, 5, 1, 10, 59, 59, 999), 60) == datetime(2024, 5, 1, 10, 59)
+    assert bucket_start(datetime(2024, 5, 1, 10, 59, 59), 3600) == datetime(2024, 5, 1, 10)
+    assert bucket_start(datetime(2024, 5, 1, 10), 3600) == datetime(2024, 5, 1, 10)
+    assert bucket_start(datetime(1969, 12, 31, 23, 59, 30), 60) == datetime(1969, 12, 31, 23, 59)
+
+
+def test_batches_are_folded_into_client_totals_and_buckets():
+    async def test(rollups, db):
+        await rollups.apply(CHECKS[:2])
+        await rollups.apply(CHECKS[2:])
+        since, until = datetime(2024, 5, 1, 10), datetime(2024, 5, 1, 11)
+        return (
+            await rollups.client_stats(),
+            await rollups.histogram("minute", since, until),
+            await rollups.histogram("hour", since, until, client_name="web"),
+        )
+
+    clients, minutes, hours = run(test)
+    assert clients == [
+        {"client_name": "ios", "count": 1, "last_seen": datetime(2024, 5, 1, 10, 1)},
+        {"client_name": "web", "count": 3, "last_seen": datetime(2024, 5, 1, 10, 59, 59)},
+    ]
+    assert [(row["bucket"].minute, row["count"]) for row in minutes] == [(0, 2), (1, 1), (59, 1)]
+    assert [row["count"] for row in hours] == [3]
+
+
+def test_client_totals_follow_the_hour_buckets_with_retention():
+    async def test(rollups, db):
+        await rollups.apply(CHECKS + [{"client_name": "ios", "timestamp": datetime(2024, 5, 1, 9, 30)}])
+        # What the TTL monitor does once the 09:00 checks are past retention
+        await rollups.buckets["hour"].delete_many({"bucket": datetime(2024, 5, 1, 9)})
+        return await rollups.client_stats()
+
+    assert [(row["client_name"], row["count"]) for row in run(test, retention_seconds=86400)] == [("ios", 1), ("web", 3)]
+    assert [(row["client_name"], row["count"]) for row in run(test)] == [("ios", 2), ("web", 3)]
+
+
+def test_buckets_expire_once_their_last_check_has():
+    async def test(rollups, db):
+        await rollups.ensure_indexes()
+        return {
+            interval: (await collection.index_information())["bucket_ttl"]["expireAfterSeconds"]
+            for interval, collection in rollups.buckets.items()
+        }
+
+    assert run(test, retention_seconds=86400) == {"minute": 86460, "hour": 90000}
+
+
+def test_rollups_are_built_from_existing_checks_only_when_first_enabled():
+    async def test(rollups, db):
+        rebuilds = []
+
+        async def rebuild():
+            rebuilds.append(True)
+
+        rollups.rebuild = rebuild
+        await rollups.initialize()
+        await rollups.apply(CHECKS)
+        await rollups.initialize()
+        return len(rebuilds)
+
+    assert run(test) == 1
@@ -0,0 +1,33 @@
+import orjson
+from tracks import TrackSnapshot
+
+TRACKS = [
+    {"id": "1", "tags": ["Instagram", "Reels"], "difficulty": "beginner"},
+    {"id": "2", "tags": ["instagram"], "difficulty": "advanced"},
+    {"id": "3", "tags": None, "difficulty": "beginner"},
+    {"id": "4", "tags": [" REELS ", "Instagram"], "difficulty": "beginner"},
+]
+
+
+def ids(tracks: list) -> list:
+    return [track["id"] for track in tracks]
+
+
+def test_tracks_must_have_every_tag_ignoring_case_and_spaces():
+    snapshot = TrackSnapshot(TRACKS, "1:x")
+    assert ids(snapshot.filter(["instagram"], None)) == ["1", "2", "4"]
+    assert ids(snapshot.filter(["Reels ", "INSTAGRAM"], None)) == ["1", "4"]
+    assert snapshot.filter(["instagram", "unknown"], None) == []
+
+
+def test_difficulty_combines_with_tags_in_catalog_order():
+    snapshot = TrackSnapshot(TRACKS, "1:x")
+    assert ids(snapshot.filter([], "beginner")) == ["1", "3", "4"]
+    assert ids(snapshot.filter(["instagram"], "beginner")) == ["1", "4"]
+    assert snapshot.filter([], "expert") == []
+
+
+def test_snapshot_serializes_the_catalog_once_per_version():
+    snapshot = TrackSnapshot(TRACKS, "1:x")
+    assert orjson.loads(snapshot.payload) == TRACKS
+    assert snapshot.etag != TrackSnapshot(TRACKS, "2:y").etag
@@ -0,0 +1,95 @@
+import asyncio
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+from pymongo.errors import WriteError
+from write_buffer import WriteBuffer
+
+
+def run(test, **options):
+    """Run test(buffer, collection) with a started buffer over a mongomock collection"""
+    async def main():
+        collection = AsyncMongoMockClient()["test"]["status_checks"]
+        buffer = WriteBuffer(collection, **options)
+        buffer.start()
+        try:
+            return await test(buffer, collection)
+        finally:
+            await buffer.close()
+    return asyncio.run(main())
+
+
+def test_full_batch_is_flushed_without_waiting_for_the_interval():
+    async def test(buffer, collection):
+        await asyncio.gather(*(buffer.add({"n": n}, wait=True) for n in range(3)))
+        return await collection.count_documents({}), buffer.stats()
+
+    count, stats = run(test, batch_size=3, flush_interval=60)
+    assert count == 3
+    assert stats["flushes"] == 1
+
+
+def test_partial_batch_is_flushed_after_the_interval():
+    async def test(buffer, collection):
+        await buffer.add({"n": 1})
+        assert await collection.count_documents({}) == 0
+        await asyncio.sleep(0.2)
+        return await collection.count_documents({})
+
+    assert run(test, batch_size=100, flush_interval=0.05) == 1
+
+
+def test_add_blocks_while_max_pending_documents_are_queued():
+    async def main():
+        buffer = WriteBuffer(AsyncMongoMockClient()["test"]["status_checks"], max_pending=2)
+        await buffer.add({"n": 1})
+        await buffer.add({"n": 2})
+        blocked = asyncio.ensure_future(buffer.add({"n": 3}))
+        await asyncio.sleep(0.05)
+        assert not blocked.done()
+
+        buffer.start()
+        await asyncio.wait_for(blocked, 1)
+        await buffer.close()
+        return buffer.stats()
+
+    assert asyncio.run(main())["written"] == 3
+
+
+def test_write_errors_are_raised_to_the_waiting_caller_only():
+    async def test(buffer, collection):
+        results = await asyncio.gather(
+            buffer.add({"_id": 1}, wait=True),
+            buffer.add({"_id": 1}, wait=True),
+            buffer.add({"_id": 2}, wait=True),
+            return_exceptions=True,
+        )
+        return results, await collection.count_documents({}), buffer.stats()
+
+    results, count, stats = run(test, batch_size=3, flush_interval=60)
+    assert results[0] is None and results[2] is None
+    assert isinstance(results[1], WriteError)
+    assert count == 2
+    assert (stats["written"], stats["failed"]) == (2, 1)
+
+
+def test_close_drains_pending_documents_and_rejects_new_ones():
+    written = []
+
+    async def on_flush(documents):
+        written.extend(document["n"] for document in documents)
+
+    async def main():
+        collection = AsyncMongoMockClient()["test"]["status_checks"]
+        buffer = WriteBuffer(collection, batch_size=4, flush_interval=60, on_flush=on_flush)
+        buffer.start()
+        for n in range(10):
+            await buffer.add({"n": n})
+        await buffer.close()
+        with pytest.raises(RuntimeError):
+            await buffer.add({"n": 10})
+        return await collection.count_documents({}), buffer.stats()
+
+    count, stats = asyncio.run(main())
+    assert count == 10
+    assert sorted(written) == list(range(10))
+    assert stats["pending"] == 0
@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+"""
+Script para preencher a chave direct_key das conversas diretas existentes
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+from dotenv import load_dotenv
+
+# Load environment variables
+backend_path = Path(__file__).parent.parent
+load_dotenv(backend_path / '.env')
+
+# Add backend to path
+sys.path.append(str(backend_path))
+
+from conversations import backfill_direct_conversation_keys
+
+async def main():
+    print("🔄 Backfilling direct conversation keys...")
+    
+    try:
+        updated = await backfill_direct_conversation_keys()
+        print(f"✅ Backfill finished: {updated} conversations updated")
+    except Exception as e:
+        print(f"❌ Backfill failed: {e}")
+        return 1
+    
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+"""
+Script para corrigir divergências nos contadores de mensagens das conversas
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+from dotenv import load_dotenv
+
+# Load environment variables
+backend_path = Path(__file__).parent.parent
+load_dotenv(backend_path / '.env')
+
+# Add backend to path
+sys.path.append(str(backend_path))
+
+from conversations import reconcile_conversation_counters
+
+async def main():
+    print("🔄 Reconciling conversation message counters...")
+    
+    try:
+        fixed = await reconcile_conversation_counters()
+        print(f"✅ Reconciliation finished: {fixed} conversations corrected")
+    except Exception as e:
+        print(f"❌ Reconciliation failed: {e}")
+        return 1
+    
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
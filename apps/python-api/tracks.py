@@ -0,0 +1,106 @@
+import os
+import hashlib
+from collections import defaultdict
+from typing import List, Optional
+from fastapi import APIRouter, Depends, Header, Query, Response, status
+from auth_middleware import get_current_user, require_admin
+from json_response import dumps, etag_matches
+from refresher import VersionedSnapshot
+from supabase_client import supabase_client, Tables
+
+router = APIRouter(prefix="/tracks", tags=["tracks"])
+
+# Columns served by the catalog; content is left out of listings
+TRACK_CATALOG_COLUMNS = "id,title,description,background_image,difficulty,duration_minutes,tags,created_at,updated_at"
+TRACK_CATALOG_REFRESH = float(os.getenv("TRACK_CATALOG_REFRESH", "30"))
+
+
+def _normalize_tag(tag: str) -> str:
+    return tag.strip().lower()
+
+
+class TrackSnapshot:
+    """Immutable view of the published tracks with tag and difficulty indexes"""
+    def __init__(self, tracks: list, version: str):
+        self.tracks = tracks
+        self.version = version
+        self.etag = '"' + hashlib.sha1(version.encode()).hexdigest() + '"'
+        self.payload = dumps(tracks)
+        self.by_tag = defaultdict(set)
+        self.by_difficulty = defaultdict(set)
+        for position, track in enumerate(tracks):
+            for tag in track.get("tags") or []:
+                self.by_tag[_normalize_tag(tag)].add(position)
+            self.by_difficulty[track.get("difficulty")].add(position)
+
+    def filter(self, tags: List[str], difficulty: Optional[str]) -> list:
+        """Tracks having all of tags and the given difficulty, in catalog order"""
+        candidates = [self.by_tag.get(_normalize_tag(tag), set()) for tag in tags]
+        if difficulty:
+            candidates.append(self.by_difficulty.get(difficulty, set()))
+        candidates.sort(key=len)
+        positions = set(candidates[0]).intersection(*candidates[1:])
+        return [self.tracks[position] for position in sorted(positions)]
+
+
+class TrackCatalog(VersionedSnapshot):
+    """
+    In-process snapshot of published tracks.
+    A background task checks the tracks version (row count and latest
+    updated_at, which also changes when a track is unpublished) every
+    refresh_interval seconds and reloads the snapshot only when it changed,
+    so catalog reads are served from memory.
+    """
+    def __init__(self, refresh_interval: float = TRACK_CATALOG_REFRESH):
+        super().__init__("Track catalog", (Tables.TRACKS,), refresh_interval)
+
+    def stats(self) -> dict:
+        return {
+            "tracks": len(self.snapshot.tracks) if self.snapshot else 0,
+            "version": self.snapshot.version if self.snapshot else None,
+            "checks": self.checks,
+            "reloads": self.reloads,
+        }
+
+    async def _load(self, version: str) -> TrackSnapshot:
+        result = await supabase_client.execute(
+            supabase_client.admin_client.table(Tables.TRACKS)
+            .select(TRACK_CATALOG_COLUMNS)
+            .eq('is_published', True)
+            .order('created_at', desc=True)
+            .order('id')
+        )
+        return TrackSnapshot(result.data or [], version)
+
+
+track_catalog = TrackCatalog()
+
+@router.get("")
+async def list_tracks(
+    tags: Optional[List[str]] = Query(None),
+    difficulty: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+    current_user: dict = Depends(get_current_user),
+):
+    """
+    Published tracks, newest first, served from the in-process catalog.
+    tags may be repeated or comma-separated; tracks must have all of them.
+    Responses carry an ETag and honour If-None-Match.
+    """
+    snapshot = await track_catalog.get()
+    headers = {"ETag": snapshot.etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(if_none_match, snapshot.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    tag_list = [tag for value in tags or [] for tag in value.split(",") if tag.strip()]
+    if not tag_list and not difficulty:
+        body = snapshot.payload
+    else:
+        body = dumps(snapshot.filter(tag_list, difficulty))
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@router.post("/refresh")
+async def refresh_tracks(current_user: dict = Depends(require_admin)):
+    """Reload the track catalog now"""
+    await track_catalog.refresh(force=True)
+    return track_catalog.stats()
@@ -0,0 +1,129 @@
+import asyncio
+import logging
+from contextlib import suppress
+from typing import Awaitable, Callable, Optional
+from pymongo.errors import BulkWriteError, WriteError
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBuffer:
+    """
+    In-process write-behind buffer for a Motor collection.
+    Documents are collected and written with insert_many(ordered=False) once
+    batch_size documents are pending or flush_interval seconds have passed.
+    add() blocks while max_pending documents are queued (backpressure).
+    on_flush, if given, is awaited with the documents each flush wrote.
+    """
+    def __init__(
+        self,
+        collection,
+        batch_size: int = 500,
+        flush_interval: float = 0.1,
+        max_pending: int = 10000,
+        on_flush: Optional[Callable[[list], Awaitable[None]]] = None,
+    ):
+        self.collection = collection
+        self.on_flush = on_flush
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_pending)
+        self._batch_ready = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._closed = False
+        self.flushes = 0
+        self.written = 0
+        self.failed = 0
+
+    def start(self) -> None:
+        """Start the background flusher on the running event loop"""
+        if self._task is None:
+            self._closed = False
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def add(self, document: dict, wait: bool = False) -> None:
+        """
+        Queue a document for writing.
+        With wait=True, returns only after the batch containing it is flushed
+        and raises if that write failed.
+        """
+        if self._closed:
+            raise RuntimeError("Write buffer is closed")
+
+        future = asyncio.get_running_loop().create_future() if wait else None
+        await self._queue.put((document, future))
+        if self._queue.qsize() >= self.batch_size:
+            self._batch_ready.set()
+
+        if future is not None:
+            await future
+
+    async def close(self) -> None:
+        """Stop accepting documents and flush everything still pending"""
+        self._closed = True
+        if self._task is not None:
+            self._batch_ready.set()
+            await self._queue.join()
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+        while not self._queue.empty():
+            await self._flush(self._take(self._queue.get_nowait()))
+
+    def stats(self) -> dict:
+        return {
+            "pending": self._queue.qsize(),
+            "flushes": self.flushes,
+            "written": self.written,
+            "failed": self.failed,
+        }
+
+    def _take(self, first: tuple) -> list:
+        batch = [first]
+        while len(batch) < self.batch_size and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            first = await self._queue.get()
+            if not self._closed and self._queue.qsize() + 1 < self.batch_size:
+                with suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(self._batch_ready.wait(), self.flush_interval)
+            self._batch_ready.clear()
+            await self._flush(self._take(first))
+
+    async def _flush(self, batch: list) -> None:
+        documents = [document for document, _ in batch]
+        errors = {}
+        try:
+            await self.collection.insert_many(documents, ordered=False)
+        except BulkWriteError as e:
+            for error in e.details.get("writeErrors", []):
+                errors[error["index"]] = WriteError(error.get("errmsg"), error.get("code"), error)
+            logger.error(f"Buffered write to {self.collection.name} partially failed: {len(errors)} errors")
+        except Exception as e:
+            errors = {index: e for index in range(len(documents))}
+            logger.error(f"Buffered write to {self.collection.name} failed: {e}")
+
+        self.flushes += 1
+        self.failed += len(errors)
+        self.written += len(documents) - len(errors)
+
+        if self.on_flush is not None and len(errors) < len(documents):
+            try:
+                await self.on_flush([
+                    document for index, document in enumerate(documents) if index not in errors
+                ])
+            except Exception as e:
+                logger.error(f"Flush hook for {self.collection.name} failed: {e}")
+
+        for index, (_, future) in enumerate(batch):
+            if future is not None and not future.done():
+                if index in errors:
+                    future.set_exception(errors[index])
+                else:
+                    future.set_result(None)
+            self._queue.task_done()
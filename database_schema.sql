@@ -88,6 +88,8 @@ CREATE TABLE public.conversation_participants (
 
 ALTER TABLE public.conversation_participants ENABLE ROW LEVEL SECURITY;
 
+CREATE INDEX idx_conversation_participants_user ON public.conversation_participants(user_id);
+
 -- RLS Policies for conversations - users can only see conversations they participate in
 CREATE POLICY "Users can view conversations they participate in" 
 ON public.conversations FOR SELECT 
@@ -154,7 +156,7 @@ CREATE TABLE public.messages (
 ALTER TABLE public.messages ENABLE ROW LEVEL SECURITY;
 
 -- Indexes for better performance
-CREATE INDEX idx_messages_conversation_created ON public.messages(conversation_id, created_at DESC);
+CREATE INDEX idx_messages_conversation_created ON public.messages(conversation_id, created_at DESC, id DESC);
 CREATE INDEX idx_messages_sender ON public.messages(sender_id);
 
 -- RLS Policies for messages
@@ -323,28 +325,103 @@ CREATE TRIGGER update_tools_updated_at
   BEFORE UPDATE ON public.tools 
   FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 
+-- Canonical key for a direct conversation between two users (order-independent)
+CREATE OR REPLACE FUNCTION direct_pair_key(user1_id UUID, user2_id UUID)
+RETURNS TEXT AS $$
+  SELECT LEAST(user1_id, user2_id)::text || ':' || GREATEST(user1_id, user2_id)::text;
+$$ LANGUAGE sql IMMUTABLE;
+
+ALTER TABLE public.conversations ADD COLUMN IF NOT EXISTS direct_key TEXT;
+CREATE UNIQUE INDEX IF NOT EXISTS idx_conversations_direct_key ON public.conversations(direct_key) WHERE direct_key IS NOT NULL;
+
 -- Function to find or create direct conversation
 CREATE OR REPLACE FUNCTION find_direct_conversation(user1_id UUID, user2_id UUID)
 RETURNS UUID AS $$
+  SELECT c.id
+  FROM public.conversations c
+  WHERE c.direct_key = direct_pair_key(user1_id, user2_id);
+$$ LANGUAGE sql STABLE SECURITY DEFINER;
+
+-- Set direct_key once a direct conversation has exactly two participants.
+-- Concurrent creations for the same pair are serialized on an advisory lock so
+-- the later one sees the committed key and stays keyless, like the duplicates
+-- left by backfill_direct_conversation_keys. A unique_violation that still gets
+-- through (e.g. racing the backfill) leaves direct_key NULL instead of failing
+-- the participant insert.
+CREATE OR REPLACE FUNCTION set_direct_conversation_key()
+RETURNS TRIGGER AS $$
 DECLARE
-  conversation_id UUID;
+  pair_key TEXT;
 BEGIN
-  SELECT c.id INTO conversation_id
-  FROM public.conversations c
-  WHERE c.type = 'direct'
-  AND EXISTS (
-    SELECT 1 FROM public.conversation_participants cp1 
-    WHERE cp1.conversation_id = c.id AND cp1.user_id = user1_id
-  )
-  AND EXISTS (
-    SELECT 1 FROM public.conversation_participants cp2 
-    WHERE cp2.conversation_id = c.id AND cp2.user_id = user2_id
+  SELECT direct_pair_key(MIN(cp.user_id::text)::uuid, MAX(cp.user_id::text)::uuid)
+  INTO pair_key
+  FROM public.conversation_participants cp
+  JOIN public.conversations c ON c.id = cp.conversation_id
+  WHERE cp.conversation_id = NEW.conversation_id AND c.type = 'direct'
+  HAVING COUNT(*) = 2;
+
+  IF pair_key IS NOT NULL THEN
+    PERFORM pg_advisory_xact_lock(hashtext(pair_key));
+    BEGIN
+      UPDATE public.conversations
+      SET direct_key = pair_key
+      WHERE id = NEW.conversation_id
+      AND direct_key IS NULL
+      AND NOT EXISTS (SELECT 1 FROM public.conversations WHERE direct_key = pair_key);
+    EXCEPTION WHEN unique_violation THEN
+      NULL;
+    END;
+  END IF;
+
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+CREATE TRIGGER set_direct_conversation_key
+  AFTER INSERT ON public.conversation_participants
+  FOR EACH ROW EXECUTE FUNCTION set_direct_conversation_key();
+
+-- Backfill direct_key for existing direct conversations, batch_size at a time.
+-- When a pair has several direct conversations, the oldest one gets the key.
+-- Returns the number of conversations updated; call until it returns 0.
+CREATE OR REPLACE FUNCTION backfill_direct_conversation_keys(batch_size INTEGER DEFAULT 1000)
+RETURNS INTEGER AS $$
+DECLARE
+  updated INTEGER;
+BEGIN
+  WITH pairs AS (
+    SELECT
+      c.id,
+      direct_pair_key(MIN(cp.user_id::text)::uuid, MAX(cp.user_id::text)::uuid) AS pair_key,
+      c.created_at
+    FROM public.conversations c
+    JOIN public.conversation_participants cp ON cp.conversation_id = c.id
+    WHERE c.type = 'direct' AND c.direct_key IS NULL
+    GROUP BY c.id, c.created_at
+    HAVING COUNT(*) = 2
+  ),
+  ranked AS (
+    SELECT id, pair_key, ROW_NUMBER() OVER (PARTITION BY pair_key ORDER BY created_at, id) AS rank
+    FROM pairs
+  ),
+  batch AS (
+    SELECT r.id, r.pair_key
+    FROM ranked r
+    WHERE r.rank = 1
+    AND NOT EXISTS (SELECT 1 FROM public.conversations c WHERE c.direct_key = r.pair_key)
+    LIMIT batch_size
   )
-  LIMIT 1;
-  
-  RETURN conversation_id;
+  UPDATE public.conversations c
+  SET direct_key = b.pair_key
+  FROM batch b
+  WHERE c.id = b.id;
+
+  GET DIAGNOSTICS updated = ROW_COUNT;
+  RETURN updated;
 END;
 $$ LANGUAGE plpgsql SECURITY DEFINER;
+REVOKE EXECUTE ON FUNCTION backfill_direct_conversation_keys(INTEGER) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION backfill_direct_conversation_keys(INTEGER) TO service_role;
 
 -- Function to get conversation details with participants
 CREATE OR REPLACE FUNCTION get_conversation_details(conv_id UUID)
@@ -385,30 +462,227 @@ BEGIN
       ), 
       '[]'::jsonb
     ) as participants,
-    (
-      SELECT COUNT(*)
-      FROM public.messages m
-      WHERE m.conversation_id = c.id
-    ) as message_count,
-    (
-      SELECT jsonb_build_object(
-        'id', m.id,
-        'content', m.content,
-        'message_type', m.message_type,
-        'sender_id', m.sender_id,
-        'sender_name', p.display_name,
-        'created_at', m.created_at
-      )
+    c.message_count,
+    c.last_message
+  FROM public.conversations c
+  WHERE c.id = conv_id;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- Function to get details for many conversations in one call
+CREATE OR REPLACE FUNCTION get_conversation_details_batch(conv_ids UUID[])
+RETURNS TABLE (
+  id UUID,
+  type TEXT,
+  title TEXT,
+  created_by UUID,
+  created_at TIMESTAMPTZ,
+  updated_at TIMESTAMPTZ,
+  participants JSONB,
+  message_count BIGINT,
+  last_message JSONB
+) AS $$
+  SELECT d.*
+  FROM unnest(conv_ids) AS ids(conv_id)
+  CROSS JOIN LATERAL get_conversation_details(ids.conv_id) d;
+$$ LANGUAGE sql STABLE SECURITY DEFINER;
+REVOKE EXECUTE ON FUNCTION get_conversation_details_batch(UUID[]) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION get_conversation_details_batch(UUID[]) TO service_role;
+
+-- =====================================================
+-- CONVERSATION MESSAGE COUNTERS (denormalized)
+-- =====================================================
+
+-- Kept current by triggers on messages so conversation listings do not
+-- count or sort messages on every read
+ALTER TABLE public.conversations ADD COLUMN IF NOT EXISTS message_count BIGINT NOT NULL DEFAULT 0;
+ALTER TABLE public.conversations ADD COLUMN IF NOT EXISTS last_message_id UUID;
+ALTER TABLE public.conversations ADD COLUMN IF NOT EXISTS last_message_at TIMESTAMPTZ;
+ALTER TABLE public.conversations ADD COLUMN IF NOT EXISTS last_message JSONB;
+
+-- Snapshot of a message as exposed in conversation listings
+CREATE OR REPLACE FUNCTION message_snapshot(msg public.messages)
+RETURNS JSONB AS $$
+  SELECT jsonb_build_object(
+    'id', msg.id,
+    'content', msg.content,
+    'message_type', msg.message_type,
+    'sender_id', msg.sender_id,
+    'sender_name', (SELECT p.display_name FROM public.profiles p WHERE p.id = msg.sender_id),
+    'created_at', msg.created_at
+  );
+$$ LANGUAGE sql STABLE;
+
+-- Recompute the last message of a conversation from the messages index
+CREATE OR REPLACE FUNCTION refresh_conversation_last_message(conv_id UUID)
+RETURNS VOID AS $$
+DECLARE
+  lm public.messages;
+BEGIN
+  SELECT * INTO lm
+  FROM public.messages m
+  WHERE m.conversation_id = conv_id
+  ORDER BY m.created_at DESC, m.id DESC
+  LIMIT 1;
+
+  UPDATE public.conversations
+  SET last_message_id = lm.id,
+      last_message_at = lm.created_at,
+      last_message = CASE WHEN lm.id IS NULL THEN NULL ELSE message_snapshot(lm) END
+  WHERE id = conv_id;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- The last message is the greatest (created_at, id), matching the message list order
+CREATE OR REPLACE FUNCTION update_conversation_message_counters()
+RETURNS TRIGGER AS $$
+BEGIN
+  IF TG_OP = 'INSERT' THEN
+    UPDATE public.conversations
+    SET message_count = message_count + 1,
+        last_message_id = CASE WHEN last_message_at IS NULL OR (NEW.created_at, NEW.id) > (last_message_at, last_message_id) THEN NEW.id ELSE last_message_id END,
+        last_message = CASE WHEN last_message_at IS NULL OR (NEW.created_at, NEW.id) > (last_message_at, last_message_id) THEN message_snapshot(NEW) ELSE last_message END,
+        last_message_at = GREATEST(last_message_at, NEW.created_at)
+    WHERE id = NEW.conversation_id;
+    RETURN NEW;
+  ELSIF TG_OP = 'DELETE' THEN
+    UPDATE public.conversations
+    SET message_count = GREATEST(message_count - 1, 0)
+    WHERE id = OLD.conversation_id;
+    IF EXISTS (SELECT 1 FROM public.conversations WHERE id = OLD.conversation_id AND last_message_id = OLD.id) THEN
+      PERFORM refresh_conversation_last_message(OLD.conversation_id);
+    END IF;
+    RETURN OLD;
+  ELSE
+    UPDATE public.conversations
+    SET last_message = message_snapshot(NEW)
+    WHERE id = NEW.conversation_id AND last_message_id = NEW.id;
+    RETURN NEW;
+  END IF;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+CREATE TRIGGER update_conversation_message_counters
+  AFTER INSERT OR DELETE OR UPDATE OF content, message_type ON public.messages
+  FOR EACH ROW EXECUTE FUNCTION update_conversation_message_counters();
+
+-- Fix counter drift for a set of conversations; returns the number of rows corrected
+CREATE OR REPLACE FUNCTION reconcile_conversation_counters(conv_ids UUID[])
+RETURNS INTEGER AS $$
+DECLARE
+  fixed INTEGER;
+BEGIN
+  WITH actual AS (
+    SELECT
+      c.id,
+      (SELECT COUNT(*) FROM public.messages m WHERE m.conversation_id = c.id) AS message_count,
+      lm.id AS last_message_id,
+      lm.created_at AS last_message_at,
+      CASE WHEN lm.id IS NULL THEN NULL ELSE message_snapshot(lm) END AS last_message
+    FROM public.conversations c
+    LEFT JOIN LATERAL (
+      SELECT m.*
       FROM public.messages m
-      JOIN public.profiles p ON p.id = m.sender_id
       WHERE m.conversation_id = c.id
-      ORDER BY m.created_at DESC
+      ORDER BY m.created_at DESC, m.id DESC
       LIMIT 1
-    ) as last_message
-  FROM public.conversations c
-  WHERE c.id = conv_id;
+    ) lm ON true
+    WHERE c.id = ANY(conv_ids)
+  )
+  UPDATE public.conversations c
+  SET message_count = a.message_count,
+      last_message_id = a.last_message_id,
+      last_message_at = a.last_message_at,
+      last_message = a.last_message
+  FROM actual a
+  WHERE c.id = a.id
+  AND (
+    c.message_count IS DISTINCT FROM a.message_count
+    OR c.last_message_id IS DISTINCT FROM a.last_message_id
+    OR c.last_message IS DISTINCT FROM a.last_message
+  );
+
+  GET DIAGNOSTICS fixed = ROW_COUNT;
+  RETURN fixed;
 END;
 $$ LANGUAGE plpgsql SECURITY DEFINER;
+REVOKE EXECUTE ON FUNCTION reconcile_conversation_counters(UUID[]) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION reconcile_conversation_counters(UUID[]) TO service_role;
+
+-- =====================================================
+-- UNREAD COUNTS
+-- =====================================================
+
+-- Unread messages per conversation for a user, from conversation_participants.last_seen.
+-- Each count is one range scan on idx_messages_conversation_created, stopped
+-- after max_count rows so large backlogs cost no more than a "99+" badge.
+CREATE OR REPLACE FUNCTION get_unread_counts(p_user_id UUID, max_count INTEGER DEFAULT 100)
+RETURNS TABLE(conversation_id UUID, unread_count INTEGER) AS $$
+  SELECT cp.conversation_id, unread.unread_count
+  FROM public.conversation_participants cp
+  CROSS JOIN LATERAL (
+    SELECT COUNT(*)::integer AS unread_count
+    FROM (
+      SELECT 1
+      FROM public.messages m
+      WHERE m.conversation_id = cp.conversation_id
+      AND m.created_at > COALESCE(cp.last_seen, '-infinity'::timestamptz)
+      AND m.sender_id IS DISTINCT FROM p_user_id
+      LIMIT max_count
+    ) capped
+  ) unread
+  WHERE cp.user_id = p_user_id;
+$$ LANGUAGE sql STABLE SECURITY DEFINER;
+REVOKE EXECUTE ON FUNCTION get_unread_counts(UUID, INTEGER) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION get_unread_counts(UUID, INTEGER) TO service_role;
+
+-- Apply coalesced last_seen updates: a JSON array of
+-- {conversation_id, user_id, last_seen}. Only existing participants are
+-- updated and last_seen never moves backwards. Returns the rows changed.
+CREATE OR REPLACE FUNCTION update_last_seen_batch(updates JSONB)
+RETURNS INTEGER AS $$
+DECLARE
+  updated INTEGER;
+BEGIN
+  UPDATE public.conversation_participants cp
+  SET last_seen = u.last_seen
+  FROM (
+    SELECT conversation_id, user_id, MAX(last_seen) AS last_seen
+    FROM jsonb_to_recordset(updates) AS r(conversation_id UUID, user_id UUID, last_seen TIMESTAMPTZ)
+    GROUP BY conversation_id, user_id
+  ) u
+  WHERE cp.conversation_id = u.conversation_id
+  AND cp.user_id = u.user_id
+  AND (cp.last_seen IS NULL OR cp.last_seen < u.last_seen);
+
+  GET DIAGNOSTICS updated = ROW_COUNT;
+  RETURN updated;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+REVOKE EXECUTE ON FUNCTION update_last_seen_batch(JSONB) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION update_last_seen_batch(JSONB) TO service_role;
+
+-- Whether a user has any unread message. conversations.last_message_at rules
+-- out read conversations without touching messages.
+CREATE OR REPLACE FUNCTION has_unread_messages(p_user_id UUID)
+RETURNS BOOLEAN AS $$
+  SELECT EXISTS (
+    SELECT 1
+    FROM public.conversation_participants cp
+    JOIN public.conversations c ON c.id = cp.conversation_id
+    WHERE cp.user_id = p_user_id
+    AND c.last_message_at > COALESCE(cp.last_seen, '-infinity'::timestamptz)
+    AND EXISTS (
+      SELECT 1
+      FROM public.messages m
+      WHERE m.conversation_id = cp.conversation_id
+      AND m.created_at > COALESCE(cp.last_seen, '-infinity'::timestamptz)
+      AND m.sender_id IS DISTINCT FROM p_user_id
+    )
+  );
+$$ LANGUAGE sql STABLE SECURITY DEFINER;
+REVOKE EXECUTE ON FUNCTION has_unread_messages(UUID) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION has_unread_messages(UUID) TO service_role;
 
 -- =====================================================
 -- STORAGE BUCKETS AND POLICIES
@@ -569,8 +843,8 @@ CREATE INDEX idx_subscriptions_status ON public.subscriptions(status);
 CREATE INDEX idx_subscriptions_stripe ON public.subscriptions(stripe_subscription_id);
 CREATE INDEX idx_payment_methods_user_id ON public.payment_methods(user_id);
 CREATE INDEX idx_payment_methods_default ON public.payment_methods(user_id, is_default) WHERE is_default = true;
-CREATE INDEX idx_billing_history_user_id ON public.billing_history(user_id);
-CREATE INDEX idx_billing_history_date ON public.billing_history(billing_date DESC);
+CREATE INDEX idx_billing_history_user_id ON public.billing_history(user_id, billing_date DESC, id DESC);
+CREATE INDEX idx_billing_history_date ON public.billing_history(billing_date DESC, id DESC);
 CREATE INDEX idx_billing_history_subscription ON public.billing_history(subscription_id);
 
 -- Triggers for updating updated_at
@@ -751,9 +1025,12 @@ CREATE TRIGGER update_faq_categories_updated_at
   BEFORE UPDATE ON public.faq_categories 
   FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 
+-- Counter-only updates (views, helpful votes) do not count as content changes
 CREATE TRIGGER update_faq_items_updated_at 
   BEFORE UPDATE ON public.faq_items 
-  FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+  FOR EACH ROW
+  WHEN ((to_jsonb(OLD) - 'view_count' - 'helpful_count' - 'updated_at') IS DISTINCT FROM (to_jsonb(NEW) - 'view_count' - 'helpful_count' - 'updated_at'))
+  EXECUTE FUNCTION update_updated_at_column();
 
 CREATE TRIGGER update_support_tickets_updated_at 
   BEFORE UPDATE ON public.support_tickets 
@@ -769,6 +1046,39 @@ BEGIN
 END;
 $$ LANGUAGE plpgsql SECURITY DEFINER;
 
+-- Apply buffered view counts: a JSON array of {id, count}. Rows are locked in
+-- id order so concurrent flushes from several workers cannot deadlock.
+-- Returns the number of items updated.
+CREATE OR REPLACE FUNCTION increment_faq_view_counts(deltas JSONB)
+RETURNS INTEGER AS $$
+DECLARE
+  updated INTEGER;
+BEGIN
+  WITH d AS (
+    SELECT id, SUM(count) AS count
+    FROM jsonb_to_recordset(deltas) AS r(id UUID, count INTEGER)
+    GROUP BY id
+  ),
+  locked AS (
+    SELECT f.id
+    FROM public.faq_items f
+    JOIN d ON d.id = f.id
+    ORDER BY f.id
+    FOR UPDATE OF f
+  )
+  UPDATE public.faq_items f
+  SET view_count = f.view_count + d.count
+  FROM d
+  WHERE f.id = d.id
+  AND f.id IN (SELECT id FROM locked);
+
+  GET DIAGNOSTICS updated = ROW_COUNT;
+  RETURN updated;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+REVOKE EXECUTE ON FUNCTION increment_faq_view_counts(JSONB) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION increment_faq_view_counts(JSONB) TO service_role;
+
 -- Sample FAQ categories data
 INSERT INTO public.faq_categories (slug, name, description, icon, sort_order) VALUES
 ('primeiros-passos', 'Primeiros Passos', 'Como começar a usar a TrendlyAI', 'Rocket', 1),
@@ -846,10 +1156,16 @@ INSERT INTO public.faq_items (category_id, question, answer, sort_order, is_feat
 -- ENABLE REALTIME (Run in Supabase dashboard)
 -- =====================================================
 -- ALTER PUBLICATION supabase_realtime ADD TABLE public.messages;
+-- ALTER PUBLICATION supabase_realtime ADD TABLE public.conversation_participants;
 -- ALTER PUBLICATION supabase_realtime ADD TABLE public.conversations;
 -- ALTER PUBLICATION supabase_realtime ADD TABLE public.profiles;
 -- ALTER PUBLICATION supabase_realtime ADD TABLE public.subscriptions;
+-- ALTER PUBLICATION supabase_realtime ADD TABLE public.subscription_plans;
 -- ALTER PUBLICATION supabase_realtime ADD TABLE public.billing_history;
 -- ALTER PUBLICATION supabase_realtime ADD TABLE public.faq_categories;
 -- ALTER PUBLICATION supabase_realtime ADD TABLE public.faq_items;
--- ALTER PUBLICATION supabase_realtime ADD TABLE public.support_tickets;
\ No newline at end of file
+-- ALTER PUBLICATION supabase_realtime ADD TABLE public.support_tickets;
+
+-- The API change feed needs user_id and conversation_id on participant
+-- DELETE events to unsubscribe removed members, not just the primary key
+ALTER TABLE public.conversation_participants REPLICA IDENTITY FULL;
\ No newline at end of file